@@ -1,10 +1,14 @@
+import asyncio
 import logging
-import os
+import threading
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import exists, select, update
 from sqlalchemy.orm import Session
 
-from backend.core.dependencies import get_db
+from backend.core.dependencies import get_db, get_neo4j_repo
 from backend.db.neo4j import Neo4jRepository
 from backend.models.database import Document as DBDocument
 from backend.models.database import KnowledgeGraph as DBKnowledgeGraph
@@ -15,35 +19,76 @@ from backend.models.schemas import (
     KnowledgeGraphResponse,
     KnowledgeGraphUpdate,
 )
+from backend.services.cache import invalidate_graph
+from backend.tasks.document_tasks import remove_files
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/graphs", tags=["graphs"])
+router = APIRouter(prefix="/graphs", tags=["graphs"], default_response_class=ORJSONResponse)
 
+# 图谱行在写入时已经过校验，列表路径用model_construct直接组装，
+# 跳过每行每字段的validator调用
+_GRAPH_FIELDS = tuple(KnowledgeGraphResponse.model_fields)
 
-def ensure_default_graph(db: Session) -> DBKnowledgeGraph:
-    """确保存在默认知识图谱"""
-    default_graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.is_default == True).first()
-    if not default_graph:
-        default_graph = DBKnowledgeGraph(
-            name="默认知识图谱",
-            description="系统默认的知识图谱",
-            is_default=True,
-            entity_count=0,
-            relation_count=0,
-            document_count=0,
-        )
-        db.add(default_graph)
-        db.commit()
-        db.refresh(default_graph)
-        logger.info("Created default knowledge graph")
-    return default_graph
 
+def _graph_response(graph: DBKnowledgeGraph) -> KnowledgeGraphResponse:
+    return KnowledgeGraphResponse.model_construct(
+        **{name: getattr(graph, name) for name in _GRAPH_FIELDS}
+    )
+
+# 默认图谱ID缓存：默认图谱在启动后基本不变，缓存ID后
+# ensure_default_graph 退化为一次主键查找（命中identity map时零查询）
+_default_graph_id: Optional[str] = None
+# 只保护慢路径：避免首次并发请求同时走查询/创建分支重复建默认图谱
+_default_graph_lock = threading.Lock()
+
+# clear_graph 是重型Neo4j操作，用信号量限并发防止打满driver连接池
+_neo4j_sem = asyncio.Semaphore(8)
 
-@router.get("", response_model=KnowledgeGraphListResponse)
-async def list_graphs(
+
+def ensure_default_graph(db: Session) -> DBKnowledgeGraph:
+    """确保存在默认知识图谱（带模块级ID缓存）"""
+    global _default_graph_id
+
+    if _default_graph_id:
+        graph = db.get(DBKnowledgeGraph, _default_graph_id)
+        if graph and graph.is_default:
+            return graph
+        # 缓存失效（默认图谱被切换），回退到查询
+        _default_graph_id = None
+
+    with _default_graph_lock:
+        # double-check：拿到锁时可能已被其他线程填好
+        if _default_graph_id:
+            graph = db.get(DBKnowledgeGraph, _default_graph_id)
+            if graph and graph.is_default:
+                return graph
+
+        default_graph = (
+            db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.is_default == True).first()
+        )
+        if not default_graph:
+            default_graph = DBKnowledgeGraph(
+                name="默认知识图谱",
+                description="系统默认的知识图谱",
+                is_default=True,
+                entity_count=0,
+                relation_count=0,
+                document_count=0,
+            )
+            db.add(default_graph)
+            db.commit()
+            db.refresh(default_graph)
+            logger.info("Created default knowledge graph")
+        _default_graph_id = default_graph.id
+        return default_graph
+
+
+# response_model=None：返回值已是目标模型，跳过FastAPI的出站二次校验
+@router.get("", response_model=None)
+def list_graphs(
     db: Session = Depends(get_db),
-):
+) -> KnowledgeGraphListResponse:
     """获取知识图谱列表"""
     # 确保存在默认图谱
     ensure_default_graph(db)
@@ -54,20 +99,20 @@ async def list_graphs(
         .all()
     )
 
-    return KnowledgeGraphListResponse(
-        graphs=[KnowledgeGraphResponse.model_validate(g) for g in graphs]
+    return KnowledgeGraphListResponse.model_construct(
+        graphs=[_graph_response(graph) for graph in graphs]
     )
 
 
 @router.post("", response_model=KnowledgeGraphResponse)
-async def create_graph(
+def create_graph(
     graph_data: KnowledgeGraphCreate,
     db: Session = Depends(get_db),
 ):
     """创建知识图谱"""
-    # 检查名称是否已存在
-    existing = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.name == graph_data.name).first()
-    if existing:
+    # 检查名称是否已存在（EXISTS短路，不取整行）
+    name_taken = db.query(exists().where(DBKnowledgeGraph.name == graph_data.name)).scalar()
+    if name_taken:
         raise HTTPException(status_code=400, detail="知识图谱名称已存在")
 
     # 创建新知识图谱
@@ -88,12 +133,12 @@ async def create_graph(
 
 
 @router.get("/{graph_id}", response_model=KnowledgeGraphResponse)
-async def get_graph(
+def get_graph(
     graph_id: str,
     db: Session = Depends(get_db),
 ):
     """获取知识图谱详情"""
-    graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
+    graph = db.get(DBKnowledgeGraph, graph_id)
 
     if not graph:
         raise HTTPException(status_code=404, detail="知识图谱不存在")
@@ -102,13 +147,13 @@ async def get_graph(
 
 
 @router.patch("/{graph_id}", response_model=KnowledgeGraphResponse)
-async def update_graph(
+def update_graph(
     graph_id: str,
     graph_data: KnowledgeGraphUpdate,
     db: Session = Depends(get_db),
 ):
     """更新知识图谱"""
-    graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
+    graph = db.get(DBKnowledgeGraph, graph_id)
 
     if not graph:
         raise HTTPException(status_code=404, detail="知识图谱不存在")
@@ -117,14 +162,14 @@ async def update_graph(
     if graph.is_default and graph_data.name and graph_data.name != graph.name:
         raise HTTPException(status_code=400, detail="不允许修改默认知识图谱的名称")
 
-    # 检查名称是否重复
+    # 检查名称是否重复（EXISTS短路，不取整行）
     if graph_data.name and graph_data.name != graph.name:
-        existing = (
-            db.query(DBKnowledgeGraph)
-            .filter(DBKnowledgeGraph.name == graph_data.name, DBKnowledgeGraph.id != graph_id)
-            .first()
-        )
-        if existing:
+        name_taken = db.query(
+            exists().where(
+                DBKnowledgeGraph.name == graph_data.name, DBKnowledgeGraph.id != graph_id
+            )
+        ).scalar()
+        if name_taken:
             raise HTTPException(status_code=400, detail="知识图谱名称已存在")
 
     # 更新字段
@@ -141,12 +186,12 @@ async def update_graph(
 
 
 @router.delete("/{graph_id}")
-async def delete_graph(
+def delete_graph(
     graph_id: str,
     db: Session = Depends(get_db),
 ):
     """删除知识图谱（包括关联的文档、任务和文件）"""
-    graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
+    graph = db.get(DBKnowledgeGraph, graph_id)
 
     if not graph:
         raise HTTPException(status_code=404, detail="知识图谱不存在")
@@ -156,24 +201,36 @@ async def delete_graph(
         raise HTTPException(status_code=400, detail="不允许删除默认知识图谱")
 
     try:
-        # 获取该图谱下的所有文档
-        documents = db.query(DBDocument).filter(DBDocument.graph_id == graph_id).all()
-
-        # 删除文档文件
-        for doc in documents:
-            if doc.file_path and os.path.exists(doc.file_path):
-                try:
-                    os.remove(doc.file_path)
-                    logger.info(f"Deleted file: {doc.file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete file {doc.file_path}: {e}")
-
-        # 删除图谱（级联删除会自动删除关联的文档和任务）
+        # 只取文件路径（删除文件用），不物化整个Document实体
+        file_paths = [
+            row[0]
+            for row in db.query(DBDocument.file_path)
+            .filter(DBDocument.graph_id == graph_id)
+            .all()
+        ]
+
+        # 集合式批量删除：任务 -> 文档 -> 图谱，各一条DELETE，
+        # 不走ORM级联的逐行加载和删除
+        db.query(DBTask).filter(
+            DBTask.document_id.in_(select(DBDocument.id).where(DBDocument.graph_id == graph_id))
+        ).delete(synchronize_session=False)
+        doc_count = (
+            db.query(DBDocument)
+            .filter(DBDocument.graph_id == graph_id)
+            .delete(synchronize_session=False)
+        )
         db.delete(graph)
         db.commit()
 
-        logger.info(f"Deleted knowledge graph: {graph_id}, with {len(documents)} documents")
-        return {"message": f"知识图谱已删除，同时删除了 {len(documents)} 个关联文档"}
+        # 文件清理交给Celery异步执行，请求延迟只取决于DB操作
+        if file_paths:
+            try:
+                remove_files.delay(file_paths)
+            except Exception as e:
+                logger.warning(f"Failed to enqueue file cleanup: {e}")
+
+        logger.info(f"Deleted knowledge graph: {graph_id}, with {doc_count} documents")
+        return {"message": f"知识图谱已删除，同时删除了 {doc_count} 个关联文档"}
 
     except Exception as e:
         db.rollback()
@@ -182,26 +239,35 @@ async def delete_graph(
 
 
 @router.post("/{graph_id}/set-default", response_model=KnowledgeGraphResponse)
-async def set_default_graph(
+def set_default_graph(
     graph_id: str,
     db: Session = Depends(get_db),
 ):
     """设置默认知识图谱"""
-    graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
+    graph = db.get(DBKnowledgeGraph, graph_id)
 
     if not graph:
         raise HTTPException(status_code=404, detail="知识图谱不存在")
 
-    # 取消所有图谱的默认状态
-    db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.is_default == True).update(
-        {"is_default": False}
+    # 取消所有图谱的默认状态：core UPDATE直达SQL，不走unit-of-work的identity map同步
+    db.execute(
+        update(DBKnowledgeGraph)
+        .where(DBKnowledgeGraph.is_default == True)
+        .values(is_default=False)
+        .execution_options(synchronize_session=False)
     )
 
-    # 设置新的默认图谱
+    # 设置新的默认图谱；先过期该属性，避免批量UPDATE绕过session后
+    # 内存值仍为True导致赋值不被标记为脏（目标图谱本来就是默认图谱的场景）
+    db.expire(graph, ["is_default"])
     graph.is_default = True
     db.commit()
     db.refresh(graph)
 
+    # 更新默认图谱ID缓存
+    global _default_graph_id
+    _default_graph_id = graph.id
+
     logger.info(f"Set default knowledge graph: {graph_id}")
     return KnowledgeGraphResponse.model_validate(graph)
 
@@ -210,39 +276,43 @@ async def set_default_graph(
 async def clear_graph(
     graph_id: str,
     db: Session = Depends(get_db),
+    neo4j_repo: Neo4jRepository = Depends(get_neo4j_repo),
 ):
     """清空指定知识图谱的所有实体和关系（保留图谱结构和文档）"""
-    graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
+    graph = db.get(DBKnowledgeGraph, graph_id)
 
     if not graph:
         raise HTTPException(status_code=404, detail="知识图谱不存在")
 
     try:
         # 清空 Neo4j 中该知识图谱的实体和关系
-        neo4j_repo = Neo4jRepository()
-        deleted_stats = neo4j_repo.clear_graph(graph_id)
+        async with _neo4j_sem:
+            deleted_stats = await neo4j_repo.clear_graph(graph_id)
+        invalidate_graph(graph_id)
         logger.info(f"Cleared Neo4j graph data for graph: {graph_id}")
 
-        # 获取该图谱下的所有文档
-        documents = db.query(DBDocument).filter(DBDocument.graph_id == graph_id).all()
-
-        # 重置所有文档状态为 pending
-        for doc in documents:
-            doc.status = "pending"
-            # 删除关联的任务记录
-            db.query(DBTask).filter(DBTask.document_id == doc.id).delete()
+        # 集合式批量操作：一条DELETE清掉任务，一条UPDATE重置文档状态，
+        # 与文档数量无关，固定两次round-trip
+        db.query(DBTask).filter(
+            DBTask.document_id.in_(select(DBDocument.id).where(DBDocument.graph_id == graph_id))
+        ).delete(synchronize_session=False)
+        reset_count = (
+            db.query(DBDocument)
+            .filter(DBDocument.graph_id == graph_id)
+            .update({"status": "pending"}, synchronize_session=False)
+        )
 
         # 更新知识图谱统计
         graph.entity_count = 0
         graph.relation_count = 0
-        graph.document_count = len(documents)  # 文档数不变
+        graph.document_count = reset_count  # 文档数不变
 
         db.commit()
 
-        logger.info(f"Cleared knowledge graph: {graph_id}, reset {len(documents)} documents")
+        logger.info(f"Cleared knowledge graph: {graph_id}, reset {reset_count} documents")
         return {
-            "message": f"已清空知识图谱，删除了 {deleted_stats['nodes']} 个实体和 {deleted_stats['relations']} 个关系，{len(documents)} 个文档已重置为待处理状态",
-            "reset_documents": len(documents),
+            "message": f"已清空知识图谱，删除了 {deleted_stats['nodes']} 个实体和 {deleted_stats['relations']} 个关系，{reset_count} 个文档已重置为待处理状态",
+            "reset_documents": reset_count,
             "deleted_nodes": deleted_stats["nodes"],
             "deleted_relations": deleted_stats["relations"],
         }
@@ -1,15 +1,29 @@
+import asyncio
 from typing import Optional
 
 from fastapi import APIRouter, Query
 from pydantic import BaseModel
 
-from backend.db.neo4j import Neo4jRepository
+from backend.core.dependencies import get_neo4j_repo
 from backend.models.schemas import KnowledgeGraphStats
+from backend.services.cache import (
+    LIST_TTL,
+    STATS_TTL,
+    get_cached,
+    invalidate_graph,
+    set_cached,
+)
 from backend.services.embedding import aget_embedding
 
 router = APIRouter(prefix="/knowledge-graph", tags=["knowledge-graph"])
 
-neo4j_repo = Neo4jRepository()
+# 与其他路由共享同一个driver连接池
+neo4j_repo = get_neo4j_repo()
+
+# 重负载端点的并发上限：突发请求在信号量处排队，
+# 而不是同时打满Neo4j连接池/embedding服务后级联超时
+NEO4J_SEM = asyncio.Semaphore(8)
+EMB_SEM = asyncio.Semaphore(16)
 
 
 class SearchRequest(BaseModel):
@@ -25,8 +39,14 @@ async def get_kg_stats(
     graph_id: Optional[str] = Query(None, description="知识图谱ID，不传则返回全局统计"),
 ):
     """获取知识图谱统计信息"""
+    cache_key = f"kg:stats:{graph_id}"
     try:
-        stats = neo4j_repo.get_stats(graph_id=graph_id)
+        cached = await get_cached(cache_key)
+        if cached is not None:
+            return KnowledgeGraphStats(**cached)
+
+        stats = await neo4j_repo.get_stats(graph_id=graph_id)
+        await set_cached(cache_key, stats, STATS_TTL)
         return KnowledgeGraphStats(**stats)
     except Exception as e:
         return KnowledgeGraphStats(
@@ -42,14 +62,21 @@ async def get_entities(
     order_by_relation_count: bool = Query(False, description="是否按关系数量降序排序"),
 ):
     """获取指定知识图谱的实体列表"""
+    cache_key = f"kg:ents:{graph_id}:{offset}:{limit}:{order_by_relation_count}"
     try:
-        entities = neo4j_repo.get_entities(
+        cached = await get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        entities = await neo4j_repo.get_entities(
             graph_id=graph_id,
             limit=limit,
             offset=offset,
             order_by_relation_count=order_by_relation_count,
         )
-        return {"entities": entities, "total": len(entities)}
+        result = {"entities": entities, "total": len(entities)}
+        await set_cached(cache_key, result, LIST_TTL)
+        return result
     except Exception as e:
         return {"entities": [], "total": 0}
 
@@ -61,19 +88,38 @@ async def get_relations(
     offset: int = Query(0, ge=0),
 ):
     """获取指定知识图谱的关系列表"""
+    cache_key = f"kg:rels:{graph_id}:{offset}:{limit}"
     try:
-        relations = neo4j_repo.get_relations(graph_id=graph_id, limit=limit, offset=offset)
-        return {"relations": relations, "total": len(relations)}
+        cached = await get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        relations = await neo4j_repo.get_relations(graph_id=graph_id, limit=limit, offset=offset)
+        result = {"relations": relations, "total": len(relations)}
+        await set_cached(cache_key, result, LIST_TTL)
+        return result
     except Exception as e:
         return {"relations": [], "total": 0}
 
 
 @router.post("/clear")
-async def clear_kg():
-    """清空所有知识图谱数据（危险操作）"""
+async def clear_kg(
+    graph_id: Optional[str] = Query(None, description="知识图谱ID，不传则清空全部（危险操作）"),
+):
+    """清空知识图谱数据
+
+    指定 graph_id 时只删除该图谱的实体和关系（工作量与该图谱大小成正比），
+    不指定时才清空整个Neo4j库。
+    """
     try:
-        neo4j_repo.clear_all()
-        return {"message": "知识图谱已清空"}
+        async with NEO4J_SEM:
+            if graph_id:
+                deleted_stats = await neo4j_repo.clear_graph(graph_id)
+                invalidate_graph(graph_id)
+                return {"message": "知识图谱已清空", **deleted_stats}
+            await neo4j_repo.clear_all()
+            invalidate_graph()
+            return {"message": "知识图谱已清空"}
     except Exception as e:
         return {"error": str(e)}
 
@@ -90,7 +136,7 @@ async def search_knowledge_graph(
         if not query.strip():
             return {"results": [], "total": 0}
 
-        results = neo4j_repo.search_entities(
+        results = await neo4j_repo.search_entities(
             graph_id=graph_id, query=query, limit=limit, search_type=search_type
         )
 
@@ -104,14 +150,17 @@ async def search_similar_entities(request: SearchRequest):
     """基于语义相似度搜索实体（用于搜索联想）"""
     try:
         # 生成查询文本的 embedding
-        query_embedding = await aget_embedding(request.query)
+        async with EMB_SEM:
+            query_embedding = await aget_embedding(request.query)
 
-        if not query_embedding:
+        # query_embedding是numpy数组，用长度判断（数组不支持隐式truthiness）
+        if query_embedding is None or len(query_embedding) == 0:
             return {"results": [], "total": 0}
 
-        results = neo4j_repo.search_by_similarity(
-            graph_id=request.graph_id, query_embedding=query_embedding, limit=request.limit
-        )
+        async with NEO4J_SEM:
+            results = await neo4j_repo.search_by_similarity(
+                graph_id=request.graph_id, query_embedding=query_embedding, limit=request.limit
+            )
 
         return {"results": results, "total": len(results)}
     except Exception as e:
@@ -126,9 +175,10 @@ async def get_entity_relations(
 ):
     """获取指定实体的关联实体"""
     try:
-        related = neo4j_repo.get_related_entities(
-            graph_id=graph_id, entity_id=entity_id, depth=depth
-        )
+        async with NEO4J_SEM:
+            related = await neo4j_repo.get_related_entities(
+                graph_id=graph_id, entity_id=entity_id, depth=depth
+            )
 
         return {"related_entities": related, "total": len(related)}
     except Exception as e:
@@ -1,25 +1,36 @@
-import json
+import asyncio
 import logging
 from typing import Optional
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from backend.core.dependencies import get_db
 from backend.models.database import Task as DBTask
 from backend.models.schemas import TaskResponse, TaskStatus
+from backend.services.progress import get_async_client, task_channel
 from backend.tasks.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+# 任务行在写入时已经过校验，列表路径用model_construct直接组装，
+# 跳过每行每字段的validator调用
+_TASK_FIELDS = tuple(TaskResponse.model_fields)
+
+
+def _task_response(task: DBTask) -> TaskResponse:
+    return TaskResponse.model_construct(**{name: getattr(task, name) for name in _TASK_FIELDS})
+
 
 @router.get("/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str, db: Session = Depends(get_db)):
+def get_task(task_id: str, db: Session = Depends(get_db)):
     """获取任务详情"""
-    task = db.query(DBTask).filter(DBTask.id == task_id).first()
+    task = db.get(DBTask, task_id)
 
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
@@ -36,50 +47,79 @@ async def get_task(task_id: str, db: Session = Depends(get_db)):
 
 @router.get("/{task_id}/stream")
 async def stream_task_progress(task_id: str, db: Session = Depends(get_db)):
-    """SSE流式推送任务进度"""
+    """SSE流式推送任务进度
+
+    先读一次数据库推送当前状态，之后订阅 Redis Pub/Sub 频道，
+    由worker的进度发布事件驱动，不再每秒轮询数据库。
+    """
 
     async def event_generator():
         """生成SSE事件"""
-        last_progress = -1
-        last_status = None
-
-        while True:
-            # 从数据库获取最新状态
-            task = db.query(DBTask).filter(DBTask.id == task_id).first()
-
-            if not task:
-                yield f"event: error\ndata: {json.dumps({'error': '任务不存在'})}\n\n"
-                break
-
-            # 检查状态变化
-            progress_changed = task.progress != last_progress
-            status_changed = task.status != last_status
-
-            if progress_changed or status_changed:
-                data = {
-                    "task_id": task.id,
-                    "status": task.status,
-                    "progress": task.progress,
-                    "current_step": task.current_step,
-                    "message": task.message,
-                    "error": task.error_message,
-                    "entities_count": task.entities_count,
-                    "relations_count": task.relations_count,
-                }
-                yield f"event: progress\ndata: {json.dumps(data)}\n\n"
-
-                last_progress = task.progress
-                last_status = task.status
-
-            # 检查任务是否完成
-            if task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-                yield f"event: complete\ndata: {json.dumps({'status': task.status})}\n\n"
-                break
-
-            # 等待再检查
-            import asyncio
-
-            await asyncio.sleep(1)
+        task = db.query(DBTask).filter(DBTask.id == task_id).first()
+
+        if not task:
+            yield b"event: error\ndata: " + orjson.dumps({"error": "任务不存在"}) + b"\n\n"
+            return
+
+        # 先推一帧当前状态
+        data = {
+            "task_id": task.id,
+            "status": task.status,
+            "progress": task.progress,
+            "current_step": task.current_step,
+            "message": task.message,
+            "error": task.error_message,
+            "entities_count": task.entities_count,
+            "relations_count": task.relations_count,
+        }
+        yield b"event: progress\ndata: " + orjson.dumps(data) + b"\n\n"
+
+        if task.status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
+            yield b"event: complete\ndata: " + orjson.dumps({"status": task.status}) + b"\n\n"
+            return
+
+        # 订阅进度频道，事件驱动推送；空闲时挂起在等待上不消耗CPU，
+        # 30秒没有消息则回源DB兜底一次，防止丢消息/worker异常导致客户端永久挂起
+        pubsub = get_async_client().pubsub()
+        await pubsub.subscribe(task_channel(task_id))
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        pubsub.get_message(ignore_subscribe_messages=True, timeout=30),
+                        timeout=35,
+                    )
+                except asyncio.TimeoutError:
+                    message = None
+
+                if message is None:
+                    # 超时心跳：重读任务状态，补推一帧
+                    db.refresh(task)
+                    payload = {
+                        "task_id": task.id,
+                        "status": task.status,
+                        "progress": task.progress,
+                        "current_step": task.current_step,
+                        "message": task.message,
+                        "error": task.error_message,
+                        "entities_count": task.entities_count,
+                        "relations_count": task.relations_count,
+                    }
+                else:
+                    payload = orjson.loads(message["data"])
+
+                yield b"event: progress\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+                if payload.get("status") in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
+                    yield (
+                        b"event: complete\ndata: "
+                        + orjson.dumps({"status": payload["status"]})
+                        + b"\n\n"
+                    )
+                    break
+        finally:
+            await pubsub.unsubscribe(task_channel(task_id))
+            await pubsub.aclose()
 
     return StreamingResponse(
         event_generator(),
@@ -93,10 +133,11 @@ async def stream_task_progress(task_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("")
-async def list_tasks(
+def list_tasks(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     status: Optional[TaskStatus] = None,
+    with_total: bool = Query(False, description="是否返回总数（COUNT需要全表/索引扫描）"),
     db: Session = Depends(get_db),
 ):
     """获取任务列表"""
@@ -105,16 +146,23 @@ async def list_tasks(
     if status:
         query = query.filter(DBTask.status == status)
 
-    total = query.count()
+    # 轮询翻页默认不付COUNT的代价，需要总数时用裸COUNT(*)而不是子查询包装
+    total = None
+    if with_total:
+        count_q = select(func.count()).select_from(DBTask)
+        if status:
+            count_q = count_q.where(DBTask.status == status)
+        total = db.scalar(count_q)
+
     tasks = query.order_by(DBTask.created_at.desc()).offset(skip).limit(limit).all()
 
-    return {"tasks": [TaskResponse.model_validate(t) for t in tasks], "total": total}
+    return {"tasks": [_task_response(task) for task in tasks], "total": total}
 
 
 @router.post("/{task_id}/cancel")
-async def cancel_task(task_id: str, db: Session = Depends(get_db)):
+def cancel_task(task_id: str, db: Session = Depends(get_db)):
     """取消任务"""
-    task = db.query(DBTask).filter(DBTask.id == task_id).first()
+    task = db.get(DBTask, task_id)
 
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
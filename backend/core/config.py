@@ -1,3 +1,4 @@
+from functools import cached_property
 from pathlib import Path
 from typing import Optional, Union
 
@@ -28,11 +29,22 @@ class Settings(BaseSettings):
     # File Storage
     UPLOAD_DIR: Path = Path(__file__).resolve().parent.parent.parent / "uploads"
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
-    ALLOWED_EXTENSIONS: set[str] = {".pdf", ".docx", ".txt", ".md"}
+    ALLOWED_EXTENSIONS: frozenset[str] = frozenset({".pdf", ".docx", ".txt", ".md"})
+
+    @cached_property
+    def ALLOWED_EXTENSIONS_DISPLAY(self) -> str:  # noqa: N802
+        """错误提示用的扩展名列表（预先join，避免每次上传重复拼接）"""
+        return ", ".join(sorted(self.ALLOWED_EXTENSIONS))
 
     # Database
     SQLITE_DB_PATH: Path = Path(__file__).resolve().parent.parent.parent / "data" / "app.db"
 
+    # Database connection pool
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 5  # 秒，排队等连接的上限
+    DB_POOL_RECYCLE: int = 1800  # 秒，定期换连接，避免长连接失效
+
     # Static Files
     STATIC_DIR: Path = Path(__file__).resolve().parent.parent / "static"
 
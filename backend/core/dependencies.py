@@ -1,17 +1,51 @@
 from functools import lru_cache
-from typing import Generator
+from typing import Generator, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from backend.core.config import settings
+from backend.db.neo4j import Neo4jRepository
 
 # SQLite Database
+# 显式配置连接池：默认的 pool_size=5 在并发请求下会出现
+# QueuePool limit reached 排队；pre_ping 在查询前剔除失效连接
 engine = create_engine(
-    f"sqlite:///{settings.SQLITE_DB_PATH}", connect_args={"check_same_thread": False}
+    f"sqlite:///{settings.SQLITE_DB_PATH}",
+    poolclass=QueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args={"check_same_thread": False},
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """为每个新连接设置SQLite PRAGMA
+
+    WAL让读写不互相阻塞，synchronous=NORMAL把每次commit的fsync
+    从2次降到批量化的~0次，mmap/cache减少读盘。
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in (
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "temp_store=MEMORY",
+        "mmap_size=268435456",  # 256 MiB
+        "cache_size=-65536",  # 64 MiB
+        "foreign_keys=ON",
+    ):
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+# expire_on_commit=False：commit后继续读属性不再触发隐式回读SELECT
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -27,3 +61,16 @@ def get_db() -> Generator[Session, None, None]:
 def get_settings():
     """获取配置单例"""
     return settings
+
+
+# 共享的Neo4j仓库：driver自带连接池，应用级复用避免每个请求
+# 重新建driver（TLS + bolt握手）
+_neo4j_repo: Optional[Neo4jRepository] = None
+
+
+def get_neo4j_repo() -> Neo4jRepository:
+    """获取共享的Neo4j仓库实例（惰性单例）"""
+    global _neo4j_repo
+    if _neo4j_repo is None:
+        _neo4j_repo = Neo4jRepository()
+    return _neo4j_repo
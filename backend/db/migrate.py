@@ -87,6 +87,27 @@ def migrate_database():
         else:
             print("默认知识图谱已存在")
 
+        # 为热点过滤/排序列创建索引
+        print("创建热点查询索引...")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_task_doc_created ON tasks (document_id, created_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_tasks_status_created_at ON tasks (status, created_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_documents_graph_id ON documents (graph_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_documents_status_created "
+            "ON documents (status, created_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_kg_is_default_created "
+            "ON knowledge_graphs (is_default, created_at)"
+        )
+        print("✓ 查询索引就绪")
+
         # 更新知识图谱的文档统计
         print("更新知识图谱统计信息...")
         cursor.execute("""
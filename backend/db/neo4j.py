@@ -1,90 +1,161 @@
 import logging
+import threading
 from typing import Optional
 
 import numpy as np
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
 
 from backend.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+def _build_related_query(depth: int) -> str:
+    """构造指定深度的关联实体查询
+
+    变长路径上限无法参数化，但深度只有少数取值：导入期为每个深度
+    生成固定的查询文本，同一文本命中Neo4j的执行计划缓存，不再每次重新规划。
+    """
+    return f"""
+        MATCH (start:Entity {{graph_id: $graph_id}})
+        WHERE elementId(start) = $entity_id
+        MATCH (start)-[r*1..{depth}]-(related:Entity {{graph_id: $graph_id}})
+        WHERE elementId(related) <> $entity_id
+        RETURN DISTINCT elementId(related) as id,
+               related.name as name,
+               related.label as label,
+               related.description as description,
+               labels(related) as labels,
+               properties(related) as props,
+               count(*) as connection_count
+        ORDER BY connection_count DESC
+        LIMIT 50
+    """
+
+
+_RELATED_QUERY_BY_DEPTH = {depth: _build_related_query(depth) for depth in range(1, 6)}
+
+
 class Neo4jRepository:
-    """Neo4j知识图谱仓库"""
+    """Neo4j知识图谱仓库
+
+    基于异步driver：Cypher round-trip期间让出事件循环，
+    大量并发请求共享单线程，不再占用FastAPI线程池。
+    """
 
     def __init__(self):
         self.driver = None
+        self._connect_lock = threading.Lock()
+        # 向量/全文索引按需创建一次（向量维度取决于embedding模型，首次查询时才知道）
+        self._vector_index_ready = False
+        self._fulltext_index_ready = False
 
     def connect(self):
-        """连接到Neo4j"""
-        if not self.driver:
-            self.driver = GraphDatabase.driver(
-                settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
-        return self.driver
+        """连接到Neo4j（线程安全，双重检查避免并发首次请求重复建driver）"""
+        if self.driver:
+            return self.driver
+
+        with self._connect_lock:
+            if not self.driver:
+                # driver本身就是长生命周期的连接池，配合单例仓库全进程只建一次；
+                # 池参数限制并发连接数并定期回收长连接
+                self.driver = AsyncGraphDatabase.driver(
+                    settings.NEO4J_URI,
+                    auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                    max_connection_pool_size=50,
+                    connection_acquisition_timeout=30,
+                    max_connection_lifetime=3600,
+                    keep_alive=True,
+                )
+            return self.driver
 
-    def close(self):
+    async def close(self):
         """关闭连接"""
         if self.driver:
-            self.driver.close()
+            await self.driver.close()
             self.driver = None
 
-    def get_stats(self, graph_id: Optional[str] = None) -> dict:
-        """获取知识图谱统计信息"""
-        driver = self.connect()
+    async def ensure_indexes(self):
+        """创建热点查询需要的Neo4j索引（幂等）
 
-        with driver.session() as session:
-            # 根据 graph_id 过滤
-            if graph_id:
-                entity_query = """
-                    MATCH (n {graph_id: $graph_id})
-                    RETURN count(n) as total, labels(n) as labels
-                """
-                relation_query = """
-                    MATCH (a {graph_id: $graph_id})-[r]->(b {graph_id: $graph_id})
-                    RETURN count(r) as total, type(r) as type
-                """
-                params = {"graph_id": graph_id}
-            else:
-                entity_query = """
-                    MATCH (n)
-                    RETURN count(n) as total, labels(n) as labels
+        所有方法都按 {graph_id: ...} 过滤，name 是搜索热点列；
+        关系类型动态生成，无法预声明关系属性索引。
+        """
+        driver = self.connect()
+        async with driver.session() as session:
+            await session.run(
+                "CREATE INDEX entity_graph_id IF NOT EXISTS FOR (n:Entity) ON (n.graph_id)"
+            )
+            await session.run(
+                "CREATE INDEX entity_name IF NOT EXISTS FOR (n:Entity) ON (n.name)"
+            )
+            # 为历史数据补打:Entity标签（幂等，分批提交）：索引都建在
+            # :Entity上，管道新写入已带该标签，老节点补齐后同样被索引
+            # 覆盖，读查询才能放心按:Entity过滤
+            await session.run(
                 """
-                relation_query = """
-                    MATCH ()-[r]->()
-                    RETURN count(r) as total, type(r) as type
+                MATCH (n)
+                WHERE n.graph_id IS NOT NULL AND NOT n:Entity
+                CALL { WITH n SET n:Entity } IN TRANSACTIONS OF 1000 ROWS
                 """
-                params = {}
-
-            # 获取实体统计
-            entity_result = session.run(entity_query, params)
-            entities = entity_result.data()
-
-            # 获取关系统计
-            relation_result = session.run(relation_query, params)
-            relations = relation_result.data()
-
-        total_entities = sum(e["total"] for e in entities)
-        total_relations = sum(r["total"] for r in relations)
+            )
+        logger.info("Neo4j indexes ensured")
 
-        entity_types = {}
-        for e in entities:
-            for label in e.get("labels", []):
-                entity_types[label] = entity_types.get(label, 0) + e["total"]
+    async def get_stats(self, graph_id: Optional[str] = None) -> dict:
+        """获取知识图谱统计信息
 
-        relation_types = {}
-        for r in relations:
-            rel_type = r.get("type", "UNKNOWN")
-            relation_types[rel_type] = relation_types.get(rel_type, 0) + r["total"]
+        单条Cypher在服务端完成分组聚合，只返回每个标签/关系类型一行，
+        不再把逐行数据拉回Python侧重新累加。
+        """
+        driver = self.connect()
 
-        return {
-            "total_entities": total_entities,
-            "total_relations": total_relations,
-            "entity_types": entity_types,
-            "relation_types": relation_types,
-        }
+        # 三个聚合分支：节点总数、按标签分组、按关系类型分组，
+        # UNION ALL 合并后每行是 (kind, type, count)
+        query = """
+            CALL {
+                MATCH (n)
+                WHERE $graph_id IS NULL OR n.graph_id = $graph_id
+                RETURN 'node_total' AS kind, '' AS t, count(n) AS c
+              UNION ALL
+                MATCH (n)
+                WHERE $graph_id IS NULL OR n.graph_id = $graph_id
+                UNWIND labels(n) AS label
+                WITH label WHERE label <> 'Entity'
+                RETURN 'entity' AS kind, label AS t, count(*) AS c
+              UNION ALL
+                MATCH (a)-[r]->(b)
+                WHERE $graph_id IS NULL
+                    OR (a.graph_id = $graph_id AND b.graph_id = $graph_id)
+                RETURN 'relation' AS kind, type(r) AS t, count(*) AS c
+            }
+            RETURN kind, t, c
+        """
 
-    def get_entities(
+        # 边流式消费边拆分到各统计项，不先用.data()物化整份结果；
+        # execute_read托管事务，瞬时故障由driver自动重试，
+        # 累加状态在回调内初始化，重试时不会叠加
+        async def _read(tx):
+            stats = {
+                "total_entities": 0,
+                "total_relations": 0,
+                "entity_types": {},
+                "relation_types": {},
+            }
+            result = await tx.run(query, {"graph_id": graph_id})
+            async for row in result:
+                if row["kind"] == "node_total":
+                    stats["total_entities"] = row["c"]
+                elif row["kind"] == "entity":
+                    stats["entity_types"][row["t"]] = row["c"]
+                else:
+                    stats["relation_types"][row["t"]] = row["c"]
+                    stats["total_relations"] += row["c"]
+            return stats
+
+        async with driver.session() as session:
+            return await session.execute_read(_read)
+
+    async def get_entities(
         self,
         graph_id: str,
         limit: int = 100,
@@ -101,71 +172,67 @@ class Neo4jRepository:
         """
         driver = self.connect()
 
-        with driver.session() as session:
+        # 服务端投影出id/labels/props，不回传Node包装对象：
+        # 省掉每行dict(node)/list(node.labels)的Python侧对象搬运
+        async def _read(tx):
             if order_by_relation_count:
                 # 按关系数量排序：统计每个实体的关系数量（作为起点或终点）
-                result = session.run(
+                result = await tx.run(
                     """
-                    MATCH (n {graph_id: $graph_id})
+                    MATCH (n:Entity {graph_id: $graph_id})
                     OPTIONAL MATCH (n)-[r]-()
                     WITH n, count(r) as relation_count
                     ORDER BY relation_count DESC
                     SKIP $offset
                     LIMIT $limit
-                    RETURN n, relation_count
+                    RETURN elementId(n) as id, labels(n) as labels,
+                           properties(n) as props, relation_count
                 """,
-                    graph_id=graph_id,
-                    offset=offset,
-                    limit=limit,
+                    {"graph_id": graph_id, "offset": offset, "limit": limit},
                 )
 
-                entities = []
-                for record in result:
-                    node = record["n"]
-                    entities.append(
-                        {
-                            "id": element_id(node),
-                            "labels": list(node.labels),
-                            "properties": dict(node),
-                            "relation_count": record["relation_count"],
-                        }
-                    )
-                return entities
+                return [
+                    {
+                        "id": record["id"],
+                        "labels": record["labels"],
+                        "properties": _strip_vectors(record["props"]),
+                        "relation_count": record["relation_count"],
+                    }
+                    async for record in result
+                ]
             else:
                 # 默认按 elementId 排序
-                result = session.run(
+                result = await tx.run(
                     """
-                    MATCH (n {graph_id: $graph_id})
-                    RETURN n
-                    ORDER BY elementId(n)
+                    MATCH (n:Entity {graph_id: $graph_id})
+                    RETURN elementId(n) as id, labels(n) as labels, properties(n) as props
+                    ORDER BY id
                     SKIP $offset
                     LIMIT $limit
                 """,
-                    graph_id=graph_id,
-                    offset=offset,
-                    limit=limit,
+                    {"graph_id": graph_id, "offset": offset, "limit": limit},
                 )
 
-                entities = []
-                for record in result:
-                    node = record["n"]
-                    entities.append(
-                        {
-                            "id": element_id(node),
-                            "labels": list(node.labels),
-                            "properties": dict(node),
-                        }
-                    )
-                return entities
+                return [
+                    {
+                        "id": record["id"],
+                        "labels": record["labels"],
+                        "properties": _strip_vectors(record["props"]),
+                    }
+                    async for record in result
+                ]
+
+        async with driver.session() as session:
+            return await session.execute_read(_read)
 
-    def get_relations(self, graph_id: str, limit: int = 100, offset: int = 0) -> list[dict]:
+    async def get_relations(self, graph_id: str, limit: int = 100, offset: int = 0) -> list[dict]:
         """获取指定知识图谱的关系列表"""
         driver = self.connect()
 
-        with driver.session() as session:
-            result = session.run(
+        async def _read(tx):
+            result = await tx.run(
                 """
-                MATCH (a {graph_id: $graph_id})-[r]->(b {graph_id: $graph_id})
+                MATCH (a:Entity {graph_id: $graph_id})-[r]->(b:Entity {graph_id: $graph_id})
                 RETURN elementId(a) as start_id, labels(a) as start_labels,
                        elementId(b) as end_id, labels(b) as end_labels,
                        type(r) as rel_type, properties(r) as props
@@ -173,13 +240,11 @@ class Neo4jRepository:
                 SKIP $offset
                 LIMIT $limit
             """,
-                graph_id=graph_id,
-                offset=offset,
-                limit=limit,
+                {"graph_id": graph_id, "offset": offset, "limit": limit},
             )
 
             relations = []
-            for record in result:
+            async for record in result:
                 relations.append(
                     {
                         "start_id": record["start_id"],
@@ -187,54 +252,56 @@ class Neo4jRepository:
                         "end_id": record["end_id"],
                         "end_labels": record["end_labels"],
                         "type": record["rel_type"],
-                        "properties": record["props"],
+                        "properties": _strip_vectors(record["props"]),
                     }
                 )
             return relations
 
-    def clear_graph(self, graph_id: str):
-        """清空指定知识图谱的所有数据"""
+        async with driver.session() as session:
+            return await session.execute_read(_read)
+
+    async def clear_graph(self, graph_id: str):
+        """清空指定知识图谱的所有数据
+
+        单条Cypher先聚合计数再DETACH DELETE，一次round-trip删完关系和节点；
+        execute_write托管事务，瞬时故障由driver自动重试。
+        """
         driver = self.connect()
 
-        with driver.session() as session:
-            # 先删除关系
-            result = session.run(
+        async def _clear(tx):
+            result = await tx.run(
                 """
-                MATCH ()-[r]->()
-                WHERE r.graph_id = $graph_id
-                DELETE r
-                RETURN count(r) as deleted
+                MATCH (n {graph_id: $graph_id})
+                OPTIONAL MATCH (n)-[r]->()
+                WITH count(DISTINCT n) as nodes, count(r) as rels
+                CALL {
+                    MATCH (m {graph_id: $graph_id})
+                    DETACH DELETE m
+                }
+                RETURN nodes, rels
             """,
-                graph_id=graph_id,
+                {"graph_id": graph_id},
             )
-            deleted_relations = result.single()["deleted"]
+            record = await result.single()
+            return record["nodes"], record["rels"]
 
-            # 再删除节点
-            result = session.run(
-                """
-                MATCH (n)
-                WHERE n.graph_id = $graph_id
-                DELETE n
-                RETURN count(n) as deleted
-            """,
-                graph_id=graph_id,
-            )
-            deleted_nodes = result.single()["deleted"]
+        async with driver.session() as session:
+            deleted_nodes, deleted_relations = await session.execute_write(_clear)
 
-            logger.info(
-                f"Cleared graph {graph_id}: deleted {deleted_nodes} nodes and {deleted_relations} relations"
-            )
-            return {"nodes": deleted_nodes, "relations": deleted_relations}
+        logger.info(
+            f"Cleared graph {graph_id}: deleted {deleted_nodes} nodes and {deleted_relations} relations"
+        )
+        return {"nodes": deleted_nodes, "relations": deleted_relations}
 
-    def clear_all(self):
+    async def clear_all(self):
         """清空所有数据"""
         driver = self.connect()
 
-        with driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+        async with driver.session() as session:
+            await session.run("MATCH (n) DETACH DELETE n")
             logger.warning("Neo4j database cleared")
 
-    def search_entities(
+    async def search_entities(
         self, graph_id: str, query: str, limit: int = 20, search_type: str = "all"
     ) -> list[dict]:
         """模糊搜索实体和关系
@@ -248,125 +315,164 @@ class Neo4jRepository:
         driver = self.connect()
         results = []
 
-        with driver.session() as session:
-            if search_type in ("all", "entity"):
-                # 搜索实体 - 不区分大小写，并返回更多结果用于排序
-                entity_query = """
-                    MATCH (n {graph_id: $graph_id})
-                    WHERE toLower(coalesce(n.name, '')) CONTAINS toLower($search_query)
-                       OR toLower(coalesce(n.description, '')) CONTAINS toLower($search_query)
-                    RETURN n, elementId(n) as entity_id
-                    LIMIT $limit_more
-                """
-                entity_result = session.run(
-                    entity_query,
-                    graph_id=graph_id,
-                    search_query=query,
-                    limit_more=limit * 3,  # 获取更多结果用于排序
-                )
+        # 关联实体CALL子查询片段：collect进同一行，
+        # 单次round-trip替代每个命中实体再发一条查询的N+1模式
+        related_subquery = """
+            CALL {
+                WITH n
+                MATCH (n)-[r]-(m:Entity {graph_id: $graph_id})
+                RETURN collect({
+                    relation_type: type(r),
+                    relation_name: coalesce(r.name, ''),
+                    entity_id: elementId(m),
+                    entity_name: coalesce(m.name, ''),
+                    entity_labels: labels(m)
+                })[..5] as related_entities
+            }
+            RETURN elementId(n) as entity_id, labels(n) as labels,
+                   properties(n) as props, related_entities
+        """
 
-                entity_results = []
-                for record in entity_result:
-                    node = record["n"]
-                    name = node.get("name", "")
-                    description = node.get("description", "")
-
-                    # 计算相关性评分
-                    relevance = self._calculate_relevance(query, name, description)
-
-                    # 获取关联实体（最多5个）
-                    related_query = """
-                        MATCH (n {graph_id: $graph_id})-[r]-(m {graph_id: $graph_id})
-                        WHERE elementId(n) = $entity_id
-                        RETURN type(r) as rel_type, r.name as rel_name,
-                               elementId(m) as target_id, m.name as target_name, labels(m) as target_labels
-                        LIMIT 5
+        entity_records = None
+        if search_type in ("all", "entity"):
+            # 优先走Lucene全文索引：索引探测替代全标签扫描+子串匹配；
+            # 查询词可能含Lucene语法字符或索引不可用，失败则回退CONTAINS扫描。
+            # 单独一个托管事务：索引查询失败不连累后面的扫描事务
+            try:
+                await self._ensure_fulltext_index()
+
+                async def _fulltext_read(tx):
+                    result = await tx.run(
+                        """
+                        CALL db.index.fulltext.queryNodes('entity_ft', $search_query)
+                        YIELD node, score
+                        WHERE node.graph_id = $graph_id
+                        WITH node as n
+                        LIMIT $limit_more
                     """
-                    related_result = session.run(
-                        related_query, graph_id=graph_id, entity_id=record["entity_id"]
+                        + related_subquery,
+                        {"graph_id": graph_id, "search_query": query, "limit_more": limit * 3},
                     )
-
-                    related_entities = []
-                    for rel_record in related_result:
-                        related_entities.append(
-                            {
-                                "relation_type": rel_record["rel_type"],
-                                "relation_name": rel_record.get("rel_name", ""),
-                                "entity_id": rel_record["target_id"],
-                                "entity_name": rel_record.get("target_name", ""),
-                                "entity_labels": rel_record.get("target_labels", []),
-                            }
-                        )
-
-                    entity_results.append(
-                        {
-                            "id": record["entity_id"],
-                            "type": "entity",
-                            "name": name,
-                            "label": node.get("label", ""),
-                            "description": description,
-                            "labels": list(node.labels),
-                            "properties": dict(node),
-                            "related_entities": related_entities,
-                            "relevance": relevance,
-                        }
+                    return [record async for record in result]
+
+                async with driver.session() as session:
+                    entity_records = await session.execute_read(_fulltext_read)
+            except Exception as e:
+                logger.warning(f"Fulltext search failed, falling back to CONTAINS scan: {e}")
+
+        # Lucene按分词匹配，部分子串查询（如词中间片段）会空手而归，
+        # 此时退回CONTAINS保持原有的子串语义
+        need_entity_scan = search_type in ("all", "entity") and not entity_records
+        need_relations = search_type in ("all", "relation")
+        relation_records = []
+
+        if need_entity_scan or need_relations:
+            # 实体回退扫描和关系扫描合并进同一个托管读事务，
+            # 共用一次会话/事务开销，瞬时故障由driver自动重试
+            async def _scan_read(tx):
+                scan_records = None
+                rel_records = []
+                if need_entity_scan:
+                    result = await tx.run(
+                        """
+                        MATCH (n:Entity {graph_id: $graph_id})
+                        WHERE toLower(coalesce(n.name, '')) CONTAINS toLower($search_query)
+                           OR toLower(coalesce(n.description, '')) CONTAINS toLower($search_query)
+                        WITH n
+                        LIMIT $limit_more
+                    """
+                        + related_subquery,
+                        # limit_more多取一些结果用于排序
+                        {"graph_id": graph_id, "search_query": query, "limit_more": limit * 3},
                     )
+                    scan_records = [record async for record in result]
+                if need_relations:
+                    # 搜索关系 - 不区分大小写
+                    result = await tx.run(
+                        """
+                        MATCH (a:Entity {graph_id: $graph_id})-[r]->(b:Entity {graph_id: $graph_id})
+                        WHERE toLower(coalesce(r.name, '')) CONTAINS toLower($search_query)
+                           OR toLower(coalesce(r.description, '')) CONTAINS toLower($search_query)
+                           OR toLower(type(r)) CONTAINS toLower($search_query)
+                        RETURN elementId(r) as relation_id, type(r) as rel_type,
+                               r.name as rel_name, r.description as rel_description,
+                               properties(r) as rel_props,
+                               elementId(a) as source_id, a.name as source_name,
+                               elementId(b) as target_id, b.name as target_name
+                        LIMIT $limit_more
+                    """,
+                        {"graph_id": graph_id, "search_query": query, "limit_more": limit * 3},
+                    )
+                    rel_records = [record async for record in result]
+                return scan_records, rel_records
 
-                # 按相关性排序并取前 limit 个
-                entity_results.sort(key=lambda x: x["relevance"], reverse=True)
-                results.extend(entity_results[:limit])
-
-            if search_type in ("all", "relation"):
-                # 搜索关系 - 不区分大小写
-                relation_query = """
-                    MATCH (a {graph_id: $graph_id})-[r]->(b {graph_id: $graph_id})
-                    WHERE toLower(coalesce(r.name, '')) CONTAINS toLower($search_query)
-                       OR toLower(coalesce(r.description, '')) CONTAINS toLower($search_query)
-                       OR toLower(type(r)) CONTAINS toLower($search_query)
-                    RETURN elementId(r) as relation_id, type(r) as rel_type,
-                           r.name as rel_name, r.description as rel_description,
-                           properties(r) as rel_props,
-                           elementId(a) as source_id, a.name as source_name,
-                           elementId(b) as target_id, b.name as target_name
-                    LIMIT $limit_more
-                """
-                relation_result = session.run(
-                    relation_query, graph_id=graph_id, search_query=query, limit_more=limit * 3
+            async with driver.session() as session:
+                scan_records, relation_records = await session.execute_read(_scan_read)
+            if scan_records is not None:
+                entity_records = scan_records
+
+        if search_type in ("all", "entity"):
+            entity_results = []
+            for record in entity_records or []:
+                props = _strip_vectors(record["props"])
+                name = props.get("name", "")
+                description = props.get("description", "")
+
+                # 计算相关性评分
+                relevance = self._calculate_relevance(query, name, description)
+
+                entity_results.append(
+                    {
+                        "id": record["entity_id"],
+                        "type": "entity",
+                        "name": name,
+                        "label": props.get("label", ""),
+                        "description": description,
+                        "labels": record["labels"],
+                        "properties": props,
+                        "related_entities": record["related_entities"],
+                        "relevance": relevance,
+                    }
                 )
 
-                relation_results = []
-                for record in relation_result:
-                    rel_name = record.get("rel_name", record["rel_type"])
-                    rel_desc = record.get("rel_description", "")
+            # 按相关性排序并取前 limit 个
+            entity_results.sort(key=lambda x: x["relevance"], reverse=True)
+            results.extend(entity_results[:limit])
 
-                    # 计算相关性评分
-                    relevance = self._calculate_relevance(
-                        query, rel_name, rel_desc, record["rel_type"]
-                    )
+        if need_relations:
+            relation_results = []
+            for record in relation_records:
+                rel_name = record.get("rel_name", record["rel_type"])
+                rel_desc = record.get("rel_description", "")
 
-                    relation_results.append(
-                        {
-                            "id": record["relation_id"],
-                            "type": "relation",
-                            "name": rel_name,
-                            "label": record["rel_type"],
-                            "description": rel_desc,
-                            "properties": record["rel_props"],
-                            "source_entity": {
-                                "id": record["source_id"],
-                                "name": record.get("source_name", ""),
-                            },
-                            "target_entity": {
-                                "id": record["target_id"],
-                                "name": record.get("target_name", ""),
-                            },
-                            "relevance": relevance,
-                        }
-                    )
+                # 计算相关性评分
+                relevance = self._calculate_relevance(
+                    query, rel_name, rel_desc, record["rel_type"]
+                )
+
+                relation_results.append(
+                    {
+                        "id": record["relation_id"],
+                        "type": "relation",
+                        "name": rel_name,
+                        "label": record["rel_type"],
+                        "description": rel_desc,
+                        "properties": _strip_vectors(record["rel_props"]),
+                        "source_entity": {
+                            "id": record["source_id"],
+                            "name": record.get("source_name", ""),
+                        },
+                        "target_entity": {
+                            "id": record["target_id"],
+                            "name": record.get("target_name", ""),
+                        },
+                        "relevance": relevance,
+                    }
+                )
 
-                # 按相关性排序
-                relation_results.sort(key=lambda x: x["relevance"], reverse=True)
-                results.extend(relation_results[:limit])
+            # 按相关性排序
+            relation_results.sort(key=lambda x: x["relevance"], reverse=True)
+            results.extend(relation_results[:limit])
 
         # 最终按相关性排序所有结果
         results.sort(key=lambda x: x["relevance"], reverse=True)
@@ -420,7 +526,28 @@ class Neo4jRepository:
 
         return 0.4
 
-    def get_related_entities(self, graph_id: str, entity_id: str, depth: int = 1) -> list[dict]:
+    async def _ensure_fulltext_index(self):
+        """确保实体全文索引存在（幂等，进程内只建一次）
+
+        关系类型是动态生成的，而全文关系索引必须枚举具体类型，
+        所以只为实体建索引，关系搜索仍走扫描。
+        """
+        if self._fulltext_index_ready:
+            return
+
+        driver = self.connect()
+        async with driver.session() as session:
+            await session.run(
+                """
+                CREATE FULLTEXT INDEX entity_ft IF NOT EXISTS
+                FOR (n:Entity) ON EACH [n.name, n.description]
+            """
+            )
+        self._fulltext_index_ready = True
+
+    async def get_related_entities(
+        self, graph_id: str, entity_id: str, depth: int = 1
+    ) -> list[dict]:
         """获取指定实体的关联实体
 
         Args:
@@ -430,28 +557,15 @@ class Neo4jRepository:
         """
         driver = self.connect()
 
-        with driver.session() as session:
-            # 使用动态深度查询
-            query = f"""
-                MATCH (start {{graph_id: $graph_id}})
-                WHERE elementId(start) = $entity_id
-                MATCH (start)-[r*1..{depth}]-(related {{graph_id: $graph_id}})
-                WHERE elementId(related) <> $entity_id
-                RETURN DISTINCT elementId(related) as id,
-                       related.name as name,
-                       related.label as label,
-                       related.description as description,
-                       labels(related) as labels,
-                       properties(related) as props,
-                       count(*) as connection_count
-                ORDER BY connection_count DESC
-                LIMIT 50
-            """
+        # 深度钳制到预生成的查询文本集合内，每个深度只有一份查询字符串
+        depth = max(1, min(depth, 5))
+        query = _RELATED_QUERY_BY_DEPTH[depth]
 
-            result = session.run(query, graph_id=graph_id, entity_id=entity_id)
+        async def _read(tx):
+            result = await tx.run(query, {"graph_id": graph_id, "entity_id": entity_id})
 
             related = []
-            for record in result:
+            async for record in result:
                 related.append(
                     {
                         "id": record["id"],
@@ -459,14 +573,17 @@ class Neo4jRepository:
                         "label": record.get("label", ""),
                         "description": record.get("description", ""),
                         "labels": record["labels"],
-                        "properties": record["props"],
+                        "properties": _strip_vectors(record["props"]),
                         "connection_count": record["connection_count"],
                     }
                 )
 
             return related
 
-    def search_by_similarity(
+        async with driver.session() as session:
+            return await session.execute_read(_read)
+
+    async def search_by_similarity(
         self, graph_id: str, query_embedding: list, limit: int = 10
     ) -> list[dict]:
         """基于 embedding 相似度搜索实体
@@ -478,44 +595,163 @@ class Neo4jRepository:
         """
         driver = self.connect()
 
-        with driver.session() as session:
+        # 查询向量可能是float16数组（embedding服务的内部表示），
+        # 过Bolt前升回float32列表
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+
+        # 优先走服务端向量索引：排序在Neo4j内完成，只有top-k行过Bolt，
+        # 不再把全部embedding拉回Python逐行算余弦
+        try:
+            await self._ensure_vector_index(len(query_vec))
+            async with driver.session() as session:
+                result = await session.run(
+                    """
+                    CALL db.index.vector.queryNodes('entity_emb', $limit_more, $q)
+                    YIELD node, score
+                    WHERE node.graph_id = $graph_id AND score > 0.65
+                    RETURN node, elementId(node) as entity_id, score
+                    LIMIT $limit
+                """,
+                    {
+                        "q": query_vec.tolist(),
+                        "graph_id": graph_id,
+                        # 多取一些再按graph_id过滤，避免过滤后不足limit
+                        "limit_more": limit * 4,
+                        "limit": limit,
+                    },
+                )
+
+                hits = [
+                    {
+                        "id": record["entity_id"],
+                        "type": "entity",
+                        "name": record["node"].get("name", ""),
+                        "label": record["node"].get("label", ""),
+                        "description": record["node"].get("description", ""),
+                        "labels": list(record["node"].labels),
+                        "properties": _strip_vectors(dict(record["node"])),
+                        "related_entities": [],
+                        # 向量索引返回的cosine分数归一化到[0,1]（(1+cos)/2），
+                        # 还原成原始余弦，与回退路径的relevance同一量纲；
+                        # 上面的0.65阈值即余弦0.3的归一化等价值
+                        "relevance": float(record["score"]) * 2 - 1,
+                    }
+                    async for record in result
+                ]
+            # 索引查空不能直接返回：索引只覆盖带:Entity标签的节点，
+            # 老数据可能不在里面，落回客户端扫描兜底
+            if hits:
+                return hits
+        except Exception as e:
+            logger.warning(f"Vector index query failed, falling back to client-side scan: {e}")
+
+        # 回退路径：老版本Neo4j或无:Entity标签的数据，客户端扫描计算
+        async with driver.session() as session:
             # 获取所有有 embedding 的实体
             query = """
-                MATCH (n {graph_id: $graph_id})
+                MATCH (n:Entity {graph_id: $graph_id})
                 WHERE n.embedding IS NOT NULL
                 RETURN n, elementId(n) as entity_id
             """
 
-            result = session.run(query, graph_id=graph_id)
+            result = await session.run(query, {"graph_id": graph_id})
 
-            entities_with_scores = []
-            for record in result:
+            dim = len(query_vec)
+            entity_ids = []
+            nodes = []
+            embeddings = []
+            quantized = []
+            async for record in result:
                 node = record["n"]
                 node_embedding = node.get("embedding")
+                if node_embedding and isinstance(node_embedding, list) and len(
+                    node_embedding
+                ) == dim:
+                    entity_ids.append(record["entity_id"])
+                    nodes.append(node)
+                    embeddings.append(node_embedding)
+                    node_i8 = node.get("embedding_i8")
+                    if node_i8 and len(node_i8) == dim:
+                        quantized.append(node_i8)
+
+        if not embeddings:
+            return []
+
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm == 0:
+            return []
+
+        if len(quantized) == len(embeddings):
+            # 全量存在int8量化副本：1/4带宽的整数打分。
+            # 余弦里量化scale分子分母相消，只需int8向量的整型范数
+            matrix_i8 = np.asarray(quantized, dtype=np.int8)
+            q8, _ = quantize_embedding(query_vec)
+            q8 = np.asarray(q8, dtype=np.int8)
+            # einsum指定int32累加器，避免int8乘加溢出，也不用升宽整个矩阵
+            acc = np.einsum("ij,j->i", matrix_i8, q8, dtype=np.int32)
+            row_norms = np.sqrt(
+                np.einsum("ij,ij->i", matrix_i8, matrix_i8, dtype=np.int32).astype(np.float32)
+            )
+            q8_norm = float(np.sqrt(np.einsum("j,j->", q8, q8, dtype=np.int32)))
+            row_norms[row_norms == 0] = 1.0
+            scores = acc / (row_norms * (q8_norm or 1.0))
+        else:
+            # FP32路径：所有embedding堆成一个(N, D)矩阵，一次GEMV算完全部相似度，
+            # 不再逐行做np.array转换+dot+norm（小向量上NumPy调用开销占主导）
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            row_norms = np.linalg.norm(matrix, axis=1)
+            row_norms[row_norms == 0] = 1.0
+            # 原地运算复用缓冲区，整个打分只扫两遍内存、零中间数组
+            scores = matrix @ query_vec
+            np.multiply(row_norms, query_norm, out=row_norms)
+            np.divide(scores, row_norms, out=scores)
+
+        # argpartition取top-k，避免对全部N个分数做完整排序
+        k = min(limit, len(scores))
+        top_idx = np.argpartition(scores, -k)[-k:]
+        top_idx = top_idx[np.argsort(scores[top_idx])[::-1]]
+
+        entities_with_scores = []
+        for i in top_idx:
+            score = float(scores[i])
+            if score <= 0.3:  # 相似度阈值
+                continue
+            node = nodes[i]
+            entities_with_scores.append(
+                {
+                    "id": entity_ids[i],
+                    "type": "entity",
+                    "name": node.get("name", ""),
+                    "label": node.get("label", ""),
+                    "description": node.get("description", ""),
+                    "labels": list(node.labels),
+                    "properties": _strip_vectors(dict(node)),
+                    "related_entities": [],
+                    "relevance": score,
+                }
+            )
 
-                if node_embedding and isinstance(node_embedding, list):
-                    # 计算余弦相似度
-                    score = cosine_similarity(query_embedding, node_embedding)
-
-                    if score > 0.3:  # 相似度阈值
-                        entities_with_scores.append(
-                            {
-                                "id": record["entity_id"],
-                                "type": "entity",
-                                "name": node.get("name", ""),
-                                "label": node.get("label", ""),
-                                "description": node.get("description", ""),
-                                "labels": list(node.labels),
-                                "properties": dict(node),
-                                "related_entities": [],
-                                "relevance": score,
-                            }
-                        )
+        return entities_with_scores
 
-            # 按相似度排序
-            entities_with_scores.sort(key=lambda x: x["relevance"], reverse=True)
+    async def _ensure_vector_index(self, dimensions: int):
+        """确保embedding向量索引存在（幂等，进程内只建一次）"""
+        if self._vector_index_ready:
+            return
 
-            return entities_with_scores[:limit]
+        driver = self.connect()
+        async with driver.session() as session:
+            # OPTIONS映射不支持参数化，维度是int直接内联
+            await session.run(
+                f"""
+                CREATE VECTOR INDEX entity_emb IF NOT EXISTS
+                FOR (n:Entity) ON (n.embedding)
+                OPTIONS {{indexConfig: {{
+                    `vector.dimensions`: {int(dimensions)},
+                    `vector.similarity_function`: 'cosine'
+                }}}}
+            """
+            )
+        self._vector_index_ready = True
 
 
 def element_id(node) -> str:
@@ -523,15 +759,49 @@ def element_id(node) -> str:
     return str(node.element_id)
 
 
+_VECTOR_KEYS = ("embedding", "embedding_i8", "embedding_scale", "embedding_f16")
+
+
+def _strip_vectors(props: Optional[dict]) -> dict:
+    """丢弃属性里的向量字段（embedding及其int8量化副本）
+
+    前端从不消费向量，而768维float列表如果留在properties里，
+    会原样进Redis缓存和JSON响应；在读取边界剔除，
+    后续序列化连遍历它的机会都没有。
+    """
+    if not props:
+        return {}
+    for key in _VECTOR_KEYS:
+        props.pop(key, None)
+    return props
+
+
+def quantize_embedding(embedding: list) -> tuple[Optional[list[int]], float]:
+    """把FP32向量对称量化为int8加标量scale
+
+    每分量占1字节，打分时整数点积的scale在余弦的分子分母相消，
+    精度损失对召回排序基本无感。
+    """
+    vec = np.asarray(embedding, dtype=np.float32)
+    max_abs = float(np.max(np.abs(vec))) if vec.size else 0.0
+    if max_abs == 0:
+        return None, 0.0
+    scale = max_abs / 127.0
+    q8 = np.round(vec / scale).astype(np.int8)
+    return q8.tolist(), scale
+
+
 def cosine_similarity(a: list, b: list) -> float:
-    """计算余弦相似度"""
-    if not a or not b or len(a) != len(b):
+    """计算余弦相似度
+
+    asarray对已是float32数组的输入零拷贝；float32减半带宽，
+    点积替代np.linalg.norm省掉其参数检查开销。
+    """
+    if a is None or b is None or len(a) != len(b) or len(a) == 0:
         return 0.0
-    a_arr = np.array(a)
-    b_arr = np.array(b)
-    dot_product = np.dot(a_arr, b_arr)
-    norm_a = np.linalg.norm(a_arr)
-    norm_b = np.linalg.norm(b_arr)
-    if norm_a == 0 or norm_b == 0:
+    a_arr = np.asarray(a, dtype=np.float32)
+    b_arr = np.asarray(b, dtype=np.float32)
+    denom = float(np.sqrt(a_arr @ a_arr) * np.sqrt(b_arr @ b_arr))
+    if denom == 0.0:
         return 0.0
-    return float(dot_product / (norm_a * norm_b))
+    return float(a_arr @ b_arr) / denom
@@ -6,7 +6,7 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 
 from backend.api import chat, documents, graphs, knowledge_graph, tasks
 from backend.core.config import settings
@@ -24,6 +24,29 @@ async def lifespan(app: FastAPI):
     # 启动时初始化数据库
     logger.info("Initializing database...")
     init_db()
+
+    # 预热默认图谱缓存，避免首个请求承担创建/查询开销
+    from backend.api.graphs import ensure_default_graph
+    from backend.core.dependencies import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ensure_default_graph(db)
+    finally:
+        db.close()
+
+    # 预热Neo4j driver：启动期完成TCP/TLS/认证握手并验证连通性，
+    # 首批并发请求不再各自付冷启动开销
+    from backend.core.dependencies import get_neo4j_repo
+
+    try:
+        neo4j_repo = get_neo4j_repo()
+        await neo4j_repo.connect().verify_connectivity()
+        # graph_id/name索引把每个按图谱过滤的MATCH从全扫描变成索引探测
+        await neo4j_repo.ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Neo4j pre-warm failed (will retry lazily): {e}")
+
     logger.info("Application started")
 
     yield
@@ -32,11 +55,13 @@ async def lifespan(app: FastAPI):
     logger.info("Application shutting down")
 
 
-# 创建FastAPI应用
+# 创建FastAPI应用；orjson在C层编码float/datetime，
+# 所有路由默认走ORJSONResponse
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # 配置CORS
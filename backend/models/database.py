@@ -1,12 +1,57 @@
+import os
+import time
 import uuid
-
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import DeclarativeBase, relationship
 from sqlalchemy.sql import func
 
 from backend.models.schemas import DocumentStatus, TaskStatus
 
 
+def _uuid7_from(ts_ms: int, rand: bytes) -> str:
+    """用给定时间戳和10字节随机数组装UUIDv7字符串"""
+    rand_int = int.from_bytes(rand, "big")
+    value = (ts_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76  # version 7
+    value |= (rand_int >> 68) << 64  # 高12位随机
+    value |= 0b10 << 62  # RFC 4122 variant
+    value |= rand_int & ((1 << 62) - 1)  # 低62位随机
+    return str(uuid.UUID(int=value))
+
+
+def uuid7() -> str:
+    """生成时间有序的UUIDv7字符串主键
+
+    高48位是毫秒时间戳，插入在主键B-tree上近似追加写，
+    避免uuid4随机落点导致的页分裂和缓存不友好。
+    随机位一次os.urandom(10)取齐，单次系统调用。
+    """
+    return _uuid7_from(time.time_ns() // 1_000_000, os.urandom(10))
+
+
+def uuid7_batch(n: int) -> list[str]:
+    """批量生成UUIDv7主键
+
+    批量插入路径用：一次os.urandom(10*n)取回全部随机字节再切片，
+    把每行一次的系统调用摊销成整批一次。
+    """
+    ts_ms = time.time_ns() // 1_000_000
+    blob = os.urandom(10 * n)
+    return [_uuid7_from(ts_ms, blob[i * 10 : (i + 1) * 10]) for i in range(n)]
+
+
 class Base(DeclarativeBase):
     """数据库基类"""
 
@@ -18,7 +63,10 @@ class KnowledgeGraph(Base):
 
     __tablename__ = "knowledge_graphs"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # list_graphs 按 (is_default DESC, created_at DESC) 排序，默认图谱查找按 is_default 过滤
+    __table_args__ = (Index("ix_kg_is_default_created", "is_default", "created_at"),)
+
+    id = Column(String, primary_key=True, default=uuid7)
     name = Column(String, nullable=False, unique=True)
     description = Column(Text, nullable=True)
     is_default = Column(Boolean, default=False)
@@ -28,8 +76,10 @@ class KnowledgeGraph(Base):
     relation_count = Column(Integer, default=0)
     document_count = Column(Integer, default=0)
 
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now()
+    )
 
     # 关联文档
     documents = relationship(
@@ -42,7 +92,14 @@ class Document(Base):
 
     __tablename__ = "documents"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # 按图谱做删除/清空/统计时都以 graph_id 过滤，SQLite不会给外键自动建索引；
+    # 文档列表按 status 过滤再按 created_at 排序，复合索引避免扫描+排序
+    __table_args__ = (
+        Index("ix_documents_graph_id", "graph_id"),
+        Index("ix_documents_status_created", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True, default=uuid7)
     filename = Column(String, nullable=False)  # 存储的文件名（带UUID前缀）
     original_filename = Column(String, nullable=False)  # 原始文件名
     file_path = Column(String, nullable=False)
@@ -52,8 +109,10 @@ class Document(Base):
     # 关联知识图谱
     graph_id = Column(String, ForeignKey("knowledge_graphs.id"), nullable=True)
 
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now()
+    )
     completed_at = Column(DateTime, nullable=True)
 
     # 关联任务和知识图谱
@@ -66,7 +125,14 @@ class Task(Base):
 
     __tablename__ = "tasks"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # 最新任务查询按 (document_id, created_at) 检索，任务列表按 status 过滤再按
+    # created_at 排序，复合索引避免扫描+排序
+    __table_args__ = (
+        Index("ix_task_doc_created", "document_id", "created_at"),
+        Index("ix_tasks_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True, default=uuid7)
     document_id = Column(String, ForeignKey("documents.id"), nullable=True)  # 可为空，用于批量任务
     celery_task_id = Column(String, unique=True, nullable=True)  # Celery任务ID
 
@@ -84,9 +150,11 @@ class Task(Base):
     entities_count = Column(Integer, default=0)  # 已提取的实体数
     relations_count = Column(Integer, default=0)  # 已提取的关系数
 
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
     started_at = Column(DateTime, nullable=True)  # 实际开始处理的时间
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now()
+    )
     completed_at = Column(DateTime, nullable=True)
 
     # 关联文档
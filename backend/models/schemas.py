@@ -2,7 +2,24 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+__all__ = [
+    "TaskStatus",
+    "DocumentStatus",
+    "DocumentUploadResponse",
+    "EntityResponse",
+    "RelationResponse",
+    "DocumentResponse",
+    "DocumentListResponse",
+    "TaskProgress",
+    "TaskResponse",
+    "KnowledgeGraphStats",
+    "KnowledgeGraphCreate",
+    "KnowledgeGraphUpdate",
+    "KnowledgeGraphResponse",
+    "KnowledgeGraphListResponse",
+]
 
 
 class TaskStatus(str, Enum):
@@ -44,10 +61,12 @@ class EntityResponse(BaseModel):
 
     label: str
     name: str
+    # embedding不序列化：768维向量会把列表响应撑大几个数量级。
+    # Config.exclude_fields不是Pydantic的真实选项（会被静默忽略），
+    # 必须用字段级exclude才能保证不进JSON
+    embedding: Optional[list[float]] = Field(default=None, exclude=True, repr=False)
 
-    class Config:
-        # 不序列化embedding字段，太大
-        exclude_fields = {"embedding"}
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RelationResponse(BaseModel):
@@ -57,9 +76,9 @@ class RelationResponse(BaseModel):
     end_entity: str
     label: str
     name: str
+    embedding: Optional[list[float]] = Field(default=None, exclude=True, repr=False)
 
-    class Config:
-        exclude_fields = {"embedding"}
+    model_config = ConfigDict(from_attributes=True)
 
 
 class DocumentResponse(BaseModel):
@@ -88,6 +107,16 @@ class DocumentResponse(BaseModel):
     class Config:
         from_attributes = False  # 禁用 from_attributes，因为我们手动构造数据
 
+    # 待处理文档的大半可选字段都是None，默认不序列化：
+    # JSON更短，orjson/gzip和网络传输都按比例省
+    def model_dump(self, **kwargs):
+        kwargs.setdefault("exclude_none", True)
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs):
+        kwargs.setdefault("exclude_none", True)
+        return super().model_dump_json(**kwargs)
+
 
 class DocumentListResponse(BaseModel):
     """文档列表响应"""
@@ -129,8 +158,8 @@ class TaskResponse(BaseModel):
     updated_at: datetime
     completed_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    # 热路径模型：冻结实例、忽略多余属性，ORM行直接校验
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 class KnowledgeGraphStats(BaseModel):
@@ -172,11 +201,28 @@ class KnowledgeGraphResponse(BaseModel):
     updated_at: datetime
     is_default: bool
 
-    class Config:
-        from_attributes = True
+    # 热路径模型：冻结实例、忽略多余属性，ORM行直接校验
+    model_config = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 
 class KnowledgeGraphListResponse(BaseModel):
     """知识图谱列表响应"""
 
     graphs: list[KnowledgeGraphResponse]
+
+
+# 在导入期完成validator/serializer编译（pydantic-core的schema构建默认
+# 推迟到首次使用，会落在冷启动后的第一个请求里），所有响应模型统一预热
+for _model in (
+    DocumentUploadResponse,
+    EntityResponse,
+    RelationResponse,
+    DocumentResponse,
+    DocumentListResponse,
+    TaskProgress,
+    TaskResponse,
+    KnowledgeGraphStats,
+    KnowledgeGraphResponse,
+    KnowledgeGraphListResponse,
+):
+    _model.model_rebuild(force=True)
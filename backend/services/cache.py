@@ -0,0 +1,92 @@
+"""查询结果缓存 - Redis cache-aside
+
+UI会高频重复请求图谱统计和实体/关系首页，命中缓存时直接从
+Redis返回，跳过Neo4j round-trip。缓存操作失败一律降级为未命中，
+不影响主流程。
+"""
+
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from backend.services.progress import get_async_client, get_sync_client
+
+logger = logging.getLogger(__name__)
+
+# TTL（秒）
+STATS_TTL = 60
+LIST_TTL = 120
+
+# 进程内短TTL缓存：挡住同一进程内的突发重复请求，命中时连Redis
+# round-trip都省掉。TTL刻意很短——跨进程失效（Redis端invalidate清不掉
+# 其他worker的本地副本）最多滞后这几秒，对统计/列表可以接受
+LOCAL_TTL = 5
+_LOCAL_MAX = 256
+_local_cache: dict[str, tuple[float, Any]] = {}
+
+
+def _local_get(key: str) -> Optional[Any]:
+    entry = _local_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def _local_set(key: str, value: Any):
+    # 惰性清理：超上限时先丢过期项，仍超限则整体清空（条目数很小，代价可忽略）
+    if len(_local_cache) >= _LOCAL_MAX:
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in _local_cache.items() if exp <= now]:
+            _local_cache.pop(k, None)
+        if len(_local_cache) >= _LOCAL_MAX:
+            _local_cache.clear()
+    _local_cache[key] = (time.monotonic() + LOCAL_TTL, value)
+
+
+async def get_cached(key: str) -> Optional[Any]:
+    """读缓存，未命中或出错返回None"""
+    hit = _local_get(key)
+    if hit is not None:
+        return hit
+    try:
+        raw = await get_async_client().get(key)
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        _local_set(key, value)
+        return value
+    except Exception as e:
+        logger.warning(f"Cache get failed: {e}")
+        return None
+
+
+async def set_cached(key: str, value: Any, ttl: int):
+    """写缓存"""
+    _local_set(key, value)
+    try:
+        await get_async_client().set(key, json.dumps(value), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Cache set failed: {e}")
+
+
+def invalidate(prefix: str):
+    """按前缀失效缓存（同步，API和worker侧都可调用）"""
+    for k in [k for k in _local_cache if k.startswith(prefix.rstrip("*"))]:
+        _local_cache.pop(k, None)
+    try:
+        client = get_sync_client()
+        keys = list(client.scan_iter(match=prefix + "*"))
+        if keys:
+            client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Cache invalidate failed: {e}")
+
+
+def invalidate_graph(graph_id: Optional[str] = None):
+    """失效某个图谱（或全部图谱）的统计与列表缓存"""
+    gid = graph_id or "*"
+    for prefix in (f"kg:stats:{gid}", f"kg:ents:{gid}", f"kg:rels:{gid}"):
+        invalidate(prefix)
+    # 全局统计不带graph_id，任何图谱变化都会影响它
+    invalidate("kg:stats:None")
@@ -1,59 +1,201 @@
 """Embedding 服务 - 使用 Ollama 生成本地向量"""
 
+import hashlib
 import logging
+import sqlite3
+import threading
 from typing import Optional
 
-from langchain_community.embeddings import OllamaEmbeddings
+import httpx
+import numpy as np
+
+from backend.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# 全局 embedding 实例
-_embedding_model: Optional[OllamaEmbeddings] = None
+OLLAMA_BASE_URL = "http://localhost:11434"
+EMBED_MODEL = "nomic-embed-text"  # Ollama 推荐的 embedding 模型
 
+# 全局HTTP客户端（连接池复用，避免每次调用重建TCP连接）
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
 
-def get_embedding_model() -> OllamaEmbeddings:
-    """获取 embedding 模型实例（单例模式）"""
-    global _embedding_model
-    if _embedding_model is None:
-        _embedding_model = OllamaEmbeddings(
-            model="nomic-embed-text",  # Ollama 推荐的 embedding 模型
-            base_url="http://localhost:11434",
-        )
-    return _embedding_model
 
+def _get_client() -> httpx.Client:
+    """获取同步HTTP客户端（单例）"""
+    global _client
+    if _client is None:
+        _client = httpx.Client(base_url=OLLAMA_BASE_URL, timeout=60)
+    return _client
 
-def get_embedding(text: str) -> list[float]:
-    """生成文本的 embedding 向量
+
+def _get_async_client() -> httpx.AsyncClient:
+    """获取异步HTTP客户端（单例）"""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(base_url=OLLAMA_BASE_URL, timeout=60)
+    return _async_client
+
+
+# 内容寻址的持久化embedding缓存：实体/关系名在文档间高度重复，
+# 命中时省掉一次Ollama推理。key是模型名+文本的blake2b摘要
+# （stdlib里最快的哈希），value是float32字节串
+_cache_conn: Optional[sqlite3.Connection] = None
+_cache_lock = threading.Lock()
+
+
+def _get_cache() -> sqlite3.Connection:
+    """获取缓存库连接（单例，延迟建库）"""
+    global _cache_conn
+    if _cache_conn is None:
+        with _cache_lock:
+            if _cache_conn is None:
+                path = settings.SQLITE_DB_PATH.parent / "embed_cache.db"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(path), check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings "
+                    "(key BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+                )
+                conn.commit()
+                _cache_conn = conn
+    return _cache_conn
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.blake2b(f"{EMBED_MODEL}\0{text}".encode(), digest_size=16).digest()
+
+
+def _cache_lookup(texts: list[str]) -> tuple[dict[int, list[float]], list[int]]:
+    """批量查缓存，返回 (命中下标->向量, 未命中下标列表)；缓存故障视为全部未命中"""
+    try:
+        conn = _get_cache()
+        hits: dict[int, list[float]] = {}
+        misses: list[int] = []
+        with _cache_lock:
+            for i, text in enumerate(texts):
+                row = conn.execute(
+                    "SELECT vec FROM embeddings WHERE key = ?", (_cache_key(text),)
+                ).fetchone()
+                if row is not None:
+                    hits[i] = np.frombuffer(row[0], dtype=np.float32).tolist()
+                else:
+                    misses.append(i)
+        return hits, misses
+    except Exception as e:
+        logger.warning("Embedding cache lookup failed: %s", e)
+        return {}, list(range(len(texts)))
+
+
+def _cache_store(texts: list[str], vectors: list[list[float]]):
+    """批量写缓存（一个事务），失败只记日志"""
+    try:
+        conn = _get_cache()
+        rows = [
+            (_cache_key(text), np.asarray(vec, dtype=np.float32).tobytes())
+            for text, vec in zip(texts, vectors)
+            if vec
+        ]
+        if not rows:
+            return
+        with _cache_lock:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", rows)
+            conn.commit()
+    except Exception as e:
+        logger.warning("Embedding cache store failed: %s", e)
+
+
+def _as_f16(vec: list[float]) -> np.ndarray:
+    """把向量收纳成float16数组：比list[float]省约24x内存，余弦召回几乎无损"""
+    return np.asarray(vec, dtype=np.float16)
+
+
+def get_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
+    """批量生成文本的 embedding 向量
+
+    直接调用Ollama的 /api/embed 批量端点：N条文本一次HTTP round-trip
+    返回全部向量，摊销每次请求的网络和模型调度开销。
 
     Args:
-        text: 输入文本
+        texts: 输入文本列表
 
     Returns:
-        embedding 向量
+        与输入等长的float16向量数组列表（失败项为空数组），整体失败时返回空列表
     """
+    if not texts:
+        return []
+    hits, misses = _cache_lookup(texts)
+    if not misses:
+        return [_as_f16(hits[i]) for i in range(len(texts))]
     try:
-        model = get_embedding_model()
-        embedding = model.embed_query(text)
-        return embedding
+        miss_texts = [texts[i] for i in misses]
+        response = _get_client().post(
+            "/api/embed", json={"model": EMBED_MODEL, "input": miss_texts}
+        )
+        response.raise_for_status()
+        fresh = response.json()["embeddings"]
+        _cache_store(miss_texts, fresh)
+        for i, vec in zip(misses, fresh):
+            hits[i] = vec
+        return [_as_f16(hits.get(i, [])) for i in range(len(texts))]
     except Exception as e:
-        logger.error(f"Failed to generate embedding: {e}")
-        # 返回空向量，避免查询失败
+        logger.error("Failed to generate embeddings batch: %s", e)
         return []
 
 
-async def aget_embedding(text: str) -> list[float]:
-    """异步生成文本的 embedding 向量
+async def aget_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
+    """异步批量生成文本的 embedding 向量
 
     Args:
-        text: 输入文本
+        texts: 输入文本列表
 
     Returns:
-        embedding 向量
+        与输入等长的float16向量数组列表（失败项为空数组），整体失败时返回空列表
     """
+    if not texts:
+        return []
+    hits, misses = _cache_lookup(texts)
+    if not misses:
+        return [_as_f16(hits[i]) for i in range(len(texts))]
     try:
-        model = get_embedding_model()
-        embedding = await model.aembed_query(text)
-        return embedding
+        miss_texts = [texts[i] for i in misses]
+        response = await _get_async_client().post(
+            "/api/embed", json={"model": EMBED_MODEL, "input": miss_texts}
+        )
+        response.raise_for_status()
+        fresh = response.json()["embeddings"]
+        _cache_store(miss_texts, fresh)
+        for i, vec in zip(misses, fresh):
+            hits[i] = vec
+        return [_as_f16(hits.get(i, [])) for i in range(len(texts))]
     except Exception as e:
-        logger.error(f"Failed to generate embedding async: {e}")
+        logger.error("Failed to generate embeddings batch async: %s", e)
         return []
+
+
+def get_embedding(text: str) -> np.ndarray:
+    """生成文本的 embedding 向量
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        float16 embedding 向量（失败时为空数组）
+    """
+    vectors = get_embeddings_batch([text])
+    return vectors[0] if vectors else _as_f16([])
+
+
+async def aget_embedding(text: str) -> np.ndarray:
+    """异步生成文本的 embedding 向量
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        float16 embedding 向量（失败时为空数组）
+    """
+    vectors = await aget_embeddings_batch([text])
+    return vectors[0] if vectors else _as_f16([])
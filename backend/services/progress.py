@@ -0,0 +1,49 @@
+"""任务进度通道 - 基于 Redis Pub/Sub 的事件推送
+
+Celery worker 在写库的同时向 `task:{task_id}` 频道发布进度，
+SSE 端点订阅频道即可事件驱动地推送，免去每秒一次的数据库轮询。
+"""
+
+import json
+import logging
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 同步客户端给Celery worker用，异步客户端给SSE端点用
+_sync_client: Optional[redis.Redis] = None
+_async_client: Optional[aioredis.Redis] = None
+
+
+def task_channel(task_id: str) -> str:
+    """任务进度频道名"""
+    return f"task:{task_id}"
+
+
+def get_sync_client() -> redis.Redis:
+    """获取同步Redis客户端（单例）"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _sync_client
+
+
+def get_async_client() -> aioredis.Redis:
+    """获取异步Redis客户端（单例）"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL)
+    return _async_client
+
+
+def publish_progress(task_id: str, payload: dict):
+    """发布任务进度（worker侧调用，失败只记日志不影响任务）"""
+    try:
+        get_sync_client().publish(task_channel(task_id), json.dumps(payload))
+    except Exception as e:
+        logger.warning(f"Failed to publish task progress: {e}")
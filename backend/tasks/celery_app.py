@@ -15,6 +15,9 @@ celery_app.conf.update(
     task_time_limit=3600,  # 1小时超时
     task_soft_time_limit=3300,  # 55分钟软超时
     result_expires=3600,  # 结果保存1小时
+    # 任务结果无消费方（前端走DB任务行+SSE），不往Redis写结果，
+    # 省掉每个任务的序列化和broker带宽
+    task_ignore_result=True,
     worker_prefetch_multiplier=1,  # 每次只取一个任务
     task_acks_late=True,  # 任务执行完才确认
     worker_max_tasks_per_child=10,  # 防止内存泄漏
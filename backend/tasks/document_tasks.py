@@ -1,23 +1,36 @@
 import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
 from typing import Optional
 
-from celery import Task
+import numpy as np
+from celery import Task, group
 from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_process_init, worker_process_shutdown
 
 # 添加DISK模块路径
 from config.llm import embeddings, llm
 
 # 导入DISK模块
 from disk import DISK
-from models.knowledge_graph import KnowledgeGraph
-from models.neo4j_connector import Neo4jConnector
-
-from backend.core.dependencies import SessionLocal
-from backend.db.neo4j import Neo4jRepository
+from models.knowledge_graph import Entity, KnowledgeGraph, Relation
+from neo4j import GraphDatabase
+from sqlalchemy import func, select
+from sqlalchemy import update as sa_update
+
+from backend.core.config import settings
+from backend.core.dependencies import SessionLocal, engine
+from backend.db.neo4j import Neo4jRepository, quantize_embedding
 from backend.models.database import Document as DBDocument
 from backend.models.database import KnowledgeGraph as DBKnowledgeGraph
 from backend.models.database import Task as DBTask
+from backend.models.database import uuid7_batch
 from backend.models.schemas import TaskStatus
+from backend.services.cache import invalidate_graph
+from backend.services.progress import publish_progress
 from backend.tasks.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
@@ -32,6 +45,59 @@ class CallbackTask(Task):
         self.neo4j_repo = Neo4jRepository()
 
 
+# worker进程级共享的同步Neo4j driver：driver自带连接池，
+# 每个文档任务复用同一池，不再每次付Bolt+TLS+认证握手的开销
+_worker_driver = None
+_worker_driver_lock = threading.Lock()
+
+
+def get_worker_driver():
+    """获取worker进程内共享的Neo4j driver（双重检查单例）"""
+    global _worker_driver
+    if _worker_driver is None:
+        with _worker_driver_lock:
+            if _worker_driver is None:
+                _worker_driver = GraphDatabase.driver(
+                    settings.NEO4J_URI,
+                    auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+                    max_connection_pool_size=16,
+                )
+    return _worker_driver
+
+
+@worker_process_init.connect
+def _init_worker_driver(**kwargs):
+    """worker子进程fork后预热driver
+
+    在子进程内创建保证连接池不跨fork共享，同时把Bolt+TLS+认证握手
+    挪到worker启动期，首个文档任务直接从池里拿连接。
+    """
+    # 丢弃从父进程fork来的SQLAlchemy池连接引用（close=False不去碰
+    # 父进程仍持有的fd），子进程按需新建；之后SessionLocal()
+    # 都是纯粹的池借用，不再每次tick付建连开销
+    engine.dispose(close=False)
+
+    try:
+        get_worker_driver().verify_connectivity()
+    except Exception as e:
+        logger.warning("Neo4j driver pre-warm failed (will retry lazily): %s", e)
+
+
+@worker_process_shutdown.connect
+def _close_worker_driver(**kwargs):
+    """worker进程退出时关闭共享driver"""
+    global _worker_driver
+    if _worker_driver is not None:
+        _worker_driver.close()
+        _worker_driver = None
+
+
+# 每个任务最近一次进度落库的时刻；中间tick按墙钟节流，
+# 终态写入时清掉对应表项
+_progress_last_write: dict[str, float] = {}
+_PROGRESS_MIN_INTERVAL = 0.5  # 秒
+
+
 def update_task_progress(
     task_id: str,
     progress: float,
@@ -43,137 +109,425 @@ def update_task_progress(
     input_tokens: int = 0,
     output_tokens: int = 0,
 ):
-    """更新任务进度到数据库"""
-    from datetime import datetime
+    """更新任务进度到数据库
+
+    单条 UPDATE ... RETURNING 完成写入并取回推送所需的字段，
+    不再先SELECT整行再逐属性赋值（每次进度写省一个round-trip）。
+
+    纯进度tick（不带状态变更）按 _PROGRESS_MIN_INTERVAL 节流：
+    密集的中间进度只保留最新一次落库+推送，COMMIT的fsync次数
+    与处理速度解耦；状态变更永远立即写入。
+    """
+    now = time.monotonic()
+    if status is None:
+        last = _progress_last_write.get(task_id)
+        if last is not None and now - last < _PROGRESS_MIN_INTERVAL:
+            return
+    if status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+        _progress_last_write.pop(task_id, None)
+    else:
+        _progress_last_write[task_id] = now
+
+    values = {
+        "progress": progress,
+        "current_step": current_step,
+        "message": message,
+        "entities_count": entities_count,
+        "relations_count": relations_count,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+    }
+    if status:
+        values["status"] = status
+        # 任务完成或失败时，设置 completed_at 时间
+        if status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
+            values["completed_at"] = datetime.utcnow()
 
     db = SessionLocal()
     try:
-        task = db.query(DBTask).filter(DBTask.id == task_id).first()
-        if task:
-            task.progress = progress
-            task.current_step = current_step
-            task.message = message
-            task.entities_count = entities_count
-            task.relations_count = relations_count
-            task.input_tokens = input_tokens
-            task.output_tokens = output_tokens
-            if status:
-                task.status = status
-                # 任务完成或失败时，设置 completed_at 时间
-                if status in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-                    task.completed_at = datetime.utcnow()
-            db.commit()
+        row = db.execute(
+            sa_update(DBTask)
+            .where(DBTask.id == task_id)
+            .values(**values)
+            .returning(DBTask.status, DBTask.error_message)
+        ).first()
+        if row is None:
+            db.rollback()
+            return
+        db.commit()
+
+        # 推送进度事件，SSE端订阅后免轮询
+        publish_progress(
+            task_id,
+            {
+                "task_id": task_id,
+                "status": row.status,
+                "progress": progress,
+                "current_step": current_step,
+                "message": message,
+                "error": row.error_message,
+                "entities_count": entities_count,
+                "relations_count": relations_count,
+            },
+        )
     except Exception as e:
-        logger.error(f"Failed to update task progress: {e}")
+        logger.error("Failed to update task progress: %s", e)
         db.rollback()
     finally:
         db.close()
 
 
-def load_knowledge_from_neo4j(graph_id: str = None) -> KnowledgeGraph:
+def _persist_kg_bulk(graph_id: str, entities: list, relations: list, batch_size: int = 1000):
+    """批量持久化新增实体和关系到Neo4j
+
+    按label分组后用 UNWIND 参数化Cypher整批MERGE：每批一次round-trip
+    和一个托管写事务，替代connector逐条create；同组查询文本固定，
+    命中Neo4j的执行计划缓存。embedding统一压到float32精度落库。
+
+    两个列表都为空时直接返回（重复处理同一文档的常见情形），
+    不开session也不跑空事务。
+    """
+    if not entities and not relations:
+        return
+
+    def _clean_label(label: str) -> str:
+        # label拼进查询文本（Cypher不支持参数化label），去掉反引号防注入
+        return (label or "").replace("`", "") or "Entity"
+
+    def _clean_embedding(embedding):
+        if embedding is None:
+            return None
+        return np.asarray(embedding, dtype=np.float32).tolist()
+
+    def _pack_f16(embedding):
+        # float16字节副本：加载路径读这个blob（2字节/维），
+        # 不再整表回传float列表（Bolt上8字节/维）
+        if embedding is None:
+            return None
+        return np.asarray(embedding, dtype=np.float16).tobytes()
+
+    with get_worker_driver().session() as session:
+        entity_groups = defaultdict(list)
+        for entity in entities:
+            embedding = _clean_embedding(entity.embedding)
+            # int8量化副本供相似度搜索的整数打分回退路径使用，
+            # 全部候选都带副本时才走得了1/4带宽的整型点积
+            embedding_i8, embedding_scale = (
+                quantize_embedding(embedding) if embedding else (None, 0.0)
+            )
+            entity_groups[_clean_label(entity.label)].append(
+                {
+                    "name": entity.name,
+                    "embedding": embedding,
+                    "embedding_f16": _pack_f16(entity.embedding),
+                    "embedding_i8": embedding_i8,
+                    "embedding_scale": embedding_scale,
+                }
+            )
+        for label, rows in entity_groups.items():
+            # 附加:Entity次级标签：仓库侧的向量/全文/range索引都建在
+            # :Entity上，没有这个标签，管道写入的数据永远不被索引覆盖
+            query = (
+                "UNWIND $rows AS row "
+                f"MERGE (n:`{label}` {{name: row.name, graph_id: $graph_id}}) "
+                "SET n:Entity, n.embedding = row.embedding, "
+                "n.embedding_f16 = row.embedding_f16, "
+                "n.embedding_i8 = row.embedding_i8, "
+                "n.embedding_scale = row.embedding_scale"
+            )
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start : start + batch_size]
+                session.execute_write(
+                    lambda tx, q=query, b=batch: tx.run(
+                        q, {"rows": b, "graph_id": graph_id}
+                    ).consume()
+                )
+
+        relation_groups = defaultdict(list)
+        for relation in relations:
+            relation_groups[_clean_label(relation.label)].append(
+                {
+                    "start": relation.start_entity.name,
+                    "end": relation.end_entity.name,
+                    "name": relation.name,
+                    "embedding": _clean_embedding(relation.embedding),
+                    "embedding_f16": _pack_f16(relation.embedding),
+                }
+            )
+        for label, rows in relation_groups.items():
+            query = (
+                "UNWIND $rows AS row "
+                "MATCH (a {name: row.start, graph_id: $graph_id}) "
+                "MATCH (b {name: row.end, graph_id: $graph_id}) "
+                f"MERGE (a)-[r:`{label}`]->(b) "
+                "SET r.name = row.name, r.embedding = row.embedding, "
+                "r.embedding_f16 = row.embedding_f16"
+            )
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start : start + batch_size]
+                session.execute_write(
+                    lambda tx, q=query, b=batch: tx.run(
+                        q, {"rows": b, "graph_id": graph_id}
+                    ).consume()
+                )
+
+    logger.info(
+        f"Persisted {len(entities)} entities and {len(relations)} relations to graph {graph_id}"
+    )
+
+
+def _new_items(original: list, final: list) -> list:
+    """取构建后列表相对快照的增量部分
+
+    DISK按追加语义扩展列表时，边界切片拿到增量是O(new)且零哈希；
+    前缀对不上（对象被重建或重排）时退回id()集合比对。快照持有
+    原对象引用，保证退回路径不会撞上id复用。
+    """
+    n = len(original)
+    if len(final) >= n and (n == 0 or (final[0] is original[0] and final[n - 1] is original[n - 1])):
+        return final[n:]
+    original_ids = {id(item) for item in original}
+    return [item for item in final if id(item) not in original_ids]
+
+
+def _dedup_entities(entities: list) -> list:
+    """按 (label, name) 哈希去重，保留首次出现的实体
+
+    一次线性扫描替代逐对比较，写Neo4j前把重复MERGE消掉。
+    """
+    seen = {}
+    for entity in entities:
+        seen.setdefault((entity.label, entity.name), entity)
+    return list(seen.values())
+
+
+def _dedup_relations(relations: list) -> list:
+    """按 (起点, 终点, label, name) 哈希去重，保留首次出现的关系"""
+    seen = {}
+    for relation in relations:
+        key = (
+            relation.start_entity.name,
+            relation.end_entity.name,
+            relation.label,
+            relation.name,
+        )
+        seen.setdefault(key, relation)
+    return list(seen.values())
+
+
+# worker进程内按graph_id缓存最近一次加载的子图：同一批量里的多个
+# 文档任务不必每次都把全部实体/关系重新拉过Bolt。条目在TTL内有效，
+# 本worker写入新内容后立即失效；其他worker的写入最多陈旧一个TTL，
+# 落库走MERGE语义，陈旧快照不会造成重复数据
+_KG_CACHE_TTL = 30.0
+_kg_cache: dict[str, tuple[float, list, list]] = {}
+_kg_cache_lock = threading.Lock()
+
+
+def _kg_cache_get(graph_id: str) -> Optional[KnowledgeGraph]:
+    """命中且未过期时返回新KG容器（实体/关系列表浅拷贝）"""
+    with _kg_cache_lock:
+        item = _kg_cache.get(graph_id)
+    if item is None or time.monotonic() - item[0] >= _KG_CACHE_TTL:
+        return None
+    kg = KnowledgeGraph()
+    kg.entities.extend(item[1])
+    kg.relations.extend(item[2])
+    return kg
+
+
+def _kg_cache_put(graph_id: str, kg: KnowledgeGraph):
+    """缓存加载结果的列表快照（调用方的kg随后会被DISK原地扩展）"""
+    with _kg_cache_lock:
+        _kg_cache[graph_id] = (time.monotonic(), kg.entities[:], kg.relations[:])
+
+
+def _kg_cache_invalidate(graph_id: str):
+    with _kg_cache_lock:
+        _kg_cache.pop(graph_id, None)
+
+
+def load_knowledge_from_neo4j(
+    graph_id: str = None, with_embeddings: bool = True
+) -> KnowledgeGraph:
     """从Neo4j加载指定知识图谱的已有数据，用于增量构建
 
     Args:
         graph_id: 知识图谱ID，如果为None则返回空KG
+        with_embeddings: 是否回传embedding。DISK的合并去重要比对向量，
+            默认开启；调用方确认下游会重新生成embedding时可关掉，
+            每条记录省下约1.5KB（f16 blob）~18KB（float列表）的Bolt传输
 
     Returns:
         KnowledgeGraph: 包含已有实体和关系的知识图谱
     """
-    from models.knowledge_graph import Entity, Relation
-    from neo4j import GraphDatabase
-
-    from backend.core.config import settings
-
     # 如果没有graph_id，返回空KG
     if not graph_id:
         return KnowledgeGraph()
 
+    # 只有完整形态（带embedding）进缓存，避免降级快照被误用
+    if with_embeddings:
+        cached = _kg_cache_get(graph_id)
+        if cached is not None:
+            return cached
+
+    def _to_f32(embedding):
+        # 新写入的节点带float16字节blob（2字节/维），直接frombuffer解包；
+        # 老数据仍是float对象列表（Bolt上8字节/维、堆上768维约18KB），
+        # 转成连续float32 ndarray后每个向量3KB，也不再有几百个小对象压GC
+        if not embedding:
+            return embedding
+        if isinstance(embedding, (bytes, bytearray)):
+            return np.frombuffer(embedding, dtype=np.float16).astype(np.float32)
+        return np.asarray(embedding, dtype=np.float32)
+
     kg = KnowledgeGraph()
 
     try:
-        driver = GraphDatabase.driver(
-            settings.NEO4J_URI, auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
-
-        with driver.session() as session:
-            # 加载该图谱的所有实体
-            entity_query = """
-                MATCH (n {graph_id: $graph_id})
-                RETURN labels(n)[0] as label, n.name as name, n.embedding as embedding
+        # fetch_size限定driver每次预取的记录窗口，结果边到边消费：
+        # 大图谱下Bolt缓冲和Python侧峰值内存都保持有界
+        with get_worker_driver().session(fetch_size=1000) as session:
+            # 实体和关系合并进同一条UNION ALL查询（与get_stats同样的
+            # kind标记行模式）：一次round-trip取回整个子图，且关系行
+            # 只带端点name，不会把实体embedding按关系数重复传输。
+            # embedding优先取float16字节blob，老数据回退float列表；
+            # 不需要向量时投影常量null，向量完全不过Bolt
+            emb_n = "coalesce(n.embedding_f16, n.embedding)" if with_embeddings else "null"
+            emb_r = "coalesce(r.embedding_f16, r.embedding)" if with_embeddings else "null"
+            load_query = f"""
+                CALL {{
+                    MATCH (n {{graph_id: $graph_id}})
+                    RETURN 'entity' AS kind, labels(n)[0] AS label, n.name AS name,
+                           {emb_n} AS embedding,
+                           null AS start_name, null AS end_name
+                    UNION ALL
+                    MATCH (a {{graph_id: $graph_id}})-[r]->(b {{graph_id: $graph_id}})
+                    RETURN 'relation' AS kind, type(r) AS label, r.name AS name,
+                           {emb_r} AS embedding,
+                           a.name AS start_name, b.name AS end_name
+                }}
+                RETURN kind, label, name, embedding, start_name, end_name
             """
-            entity_result = session.run(entity_query, {"graph_id": graph_id})
-            for record in entity_result:
-                entity = Entity(
-                    label=record["label"] or "Entity",
-                    name=record["name"],
-                    embedding=record["embedding"],
-                )
-                kg.entities.append(entity)
+            result = session.run(load_query, {"graph_id": graph_id})
+
+            # entity_map随流构建；关系行先暂存字段，流结束后端点必然齐备
+            entity_map = {}
+            pending_relations = []
+            for record in result:
+                if record["kind"] == "entity":
+                    entity = Entity(
+                        label=record["label"] or "Entity",
+                        name=record["name"],
+                        embedding=_to_f32(record["embedding"]),
+                    )
+                    kg.entities.append(entity)
+                    entity_map[entity.name] = entity
+                else:
+                    pending_relations.append(
+                        (
+                            record["start_name"],
+                            record["end_name"],
+                            record["label"],
+                            record["name"],
+                            _to_f32(record["embedding"]),
+                        )
+                    )
 
-            # 加载该图谱的所有关系
-            # 需要重新构建Entity对象作为关系的起点和终点
-            entity_map = {e.name: e for e in kg.entities}
-
-            relation_query = """
-                MATCH (a {graph_id: $graph_id})-[r]->(b {graph_id: $graph_id})
-                RETURN labels(a)[0] as start_label, a.name as start_name,
-                       labels(b)[0] as end_label, b.name as end_name,
-                       type(r) as label, r.name as name, r.embedding as embedding
-            """
-            relation_result = session.run(relation_query, {"graph_id": graph_id})
-            for record in relation_result:
-                start_entity = entity_map.get(record["start_name"])
-                end_entity = entity_map.get(record["end_name"])
+            for start_name, end_name, label, name, embedding in pending_relations:
+                start_entity = entity_map.get(start_name)
+                end_entity = entity_map.get(end_name)
 
                 if start_entity and end_entity:
                     relation = Relation(
                         start_entity=start_entity,
                         end_entity=end_entity,
-                        label=record["label"] or "RELATION",
-                        name=record["name"],
-                        embedding=record["embedding"],
+                        label=label or "RELATION",
+                        name=name,
+                        embedding=embedding,
                     )
                     kg.relations.append(relation)
 
-        driver.close()
         logger.info(
             f"Loaded knowledge graph {graph_id}: {len(kg.entities)} entities, {len(kg.relations)} relations"
         )
+        if with_embeddings:
+            _kg_cache_put(graph_id, kg)
 
     except Exception as e:
-        logger.error(f"Failed to load knowledge graph from Neo4j: {e}")
+        logger.error("Failed to load knowledge graph from Neo4j: %s", e)
 
     return kg
 
 
-def update_graph_stats(graph_id: str, db: SessionLocal):
-    """更新知识图谱的统计信息（直接从Neo4j获取实际数量）"""
-    try:
-        from backend.db.neo4j import Neo4jRepository
-
-        # 从 Neo4j 获取实际的实体和关系数量
-        neo4j_repo = Neo4jRepository()
-        stats = neo4j_repo.get_stats(graph_id=graph_id)
-
-        entity_count = stats.get("total_entities", 0)
-        relation_count = stats.get("total_relations", 0)
+def update_graph_stats(graph_id: str, db: SessionLocal, with_kg_counts: bool = True):
+    """更新知识图谱的统计信息（直接从Neo4j获取实际数量）
 
-        # 获取该图谱下的文档数量
-        doc_count = db.query(DBDocument).filter(DBDocument.graph_id == graph_id).count()
+    Args:
+        graph_id: 知识图谱ID
+        db: 数据库会话
+        with_kg_counts: 是否重新统计Neo4j侧的实体/关系数量。
+            任务没有写入新内容时图计数不可能变化，传False只刷新
+            SQLite侧的document_count，省掉两次Neo4j聚合
+    """
+    try:
+        values = {}
+        if with_kg_counts:
+            # 从 Neo4j 获取实际的实体和关系数量（共享driver上的同步查询，
+            # 两个CALL子查询一次round-trip取回两个计数）
+            with get_worker_driver().session() as session:
+                record = session.run(
+                    """
+                    CALL { MATCH (n {graph_id: $graph_id}) RETURN count(n) AS entities }
+                    CALL {
+                        MATCH (a {graph_id: $graph_id})-[r]->(b {graph_id: $graph_id})
+                        RETURN count(r) AS relations
+                    }
+                    RETURN entities, relations
+                """,
+                    {"graph_id": graph_id},
+                ).single()
+
+            values["entity_count"] = int(record["entities"]) if record else 0
+            values["relation_count"] = int(record["relations"]) if record else 0
+
+        # 单条UPDATE写回统计：文档数用标量子查询在SQLite内算，
+        # 替代原来的 COUNT查询 + 整行SELECT + UPDATE 三次round-trip
+        values["document_count"] = (
+            select(func.count())
+            .select_from(DBDocument)
+            .where(DBDocument.graph_id == graph_id)
+            .scalar_subquery()
+        )
+        result = db.execute(
+            sa_update(DBKnowledgeGraph)
+            .where(DBKnowledgeGraph.id == graph_id)
+            .values(**values)
+        )
+        db.commit()
 
-        # 更新知识图谱的统计信息
-        graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
-        if graph:
-            graph.entity_count = int(entity_count)
-            graph.relation_count = int(relation_count)
-            graph.document_count = doc_count
-            db.commit()
+        if result.rowcount:
+            # 图谱内容已变化，失效统计/列表缓存
+            invalidate_graph(graph_id)
             logger.info(
-                f"Updated graph {graph_id} stats: {entity_count} entities, {relation_count} relations, {doc_count} documents"
+                f"Updated graph {graph_id} stats: "
+                f"{values.get('entity_count', 'unchanged')} entities, "
+                f"{values.get('relation_count', 'unchanged')} relations"
             )
 
     except Exception as e:
-        logger.error(f"Failed to update graph stats: {e}")
+        logger.error("Failed to update graph stats: %s", e)
+
+
+def _set_document_status(db, document_id: str, status: TaskStatus):
+    """单条UPDATE写回文档状态
+
+    状态流转只改一列，不值得先把整行ORM对象加载进identity map
+    再flush回去。
+    """
+    db.execute(
+        sa_update(DBDocument).where(DBDocument.id == document_id).values(status=status)
+    )
+    db.commit()
 
 
 @celery_app.task(base=CallbackTask, name="backend.tasks.document_tasks.process_document", bind=True)
@@ -188,24 +542,31 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
     db = SessionLocal()
     graph_id = None
     try:
-        # 获取文档信息，获取关联的知识图谱
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if not document:
-            raise Exception(f"文档不存在: {document_id}")
-
-        graph_id = document.graph_id
-        graph = None
+        # 只取需要的列：graph_id定位图谱，图谱名只用于提示信息
+        graph_id = db.execute(
+            select(DBDocument.graph_id).where(DBDocument.id == document_id)
+        ).scalar_one_or_none()
+        if graph_id is None:
+            exists = db.execute(
+                select(DBDocument.id).where(DBDocument.id == document_id)
+            ).first()
+            if exists is None:
+                raise Exception(f"文档不存在: {document_id}")
+
+        graph_name = None
         if graph_id:
-            graph = db.query(DBKnowledgeGraph).filter(DBKnowledgeGraph.id == graph_id).first()
-            if graph:
-                logger.info(f"Processing document for graph: {graph.name}")
+            graph_name = db.execute(
+                select(DBKnowledgeGraph.name).where(DBKnowledgeGraph.id == graph_id)
+            ).scalar_one_or_none()
+            if graph_name:
+                logger.info(f"Processing document for graph: {graph_name}")
 
         # 更新任务状态为处理中
         update_task_progress(
             task_id,
             0.0,
             "初始化",
-            f"准备处理文档{' (图谱: ' + graph.name + ')' if graph else ''}...",
+            f"准备处理文档{' (图谱: ' + graph_name + ')' if graph_name else ''}...",
             TaskStatus.PROCESSING,
         )
 
@@ -213,9 +574,9 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
         # 从Neo4j加载该图谱的已有数据，实现增量构建
         kg = load_knowledge_from_neo4j(graph_id)
 
-        # 获取原始实体列表的ID，用于后续比较
-        original_entity_ids = {id(e) for e in kg.entities}
-        original_relation_ids = {id(r) for r in kg.relations}
+        # 快照原始实体/关系引用（浅拷贝指针），用于后续取增量
+        original_entities = kg.entities[:]
+        original_relations = kg.relations[:]
 
         logger.info(
             f"[DEBUG] graph_id={graph_id}, original_entities={len(kg.entities)}, original_relations={len(kg.relations)}"
@@ -246,10 +607,10 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
                 f"Token usage - Input: {input_tokens}, Output: {output_tokens}, Total: {input_tokens + output_tokens}"
             )
 
-        # 计算新增的实体和关系（用于持久化）
-        # 通过对象ID来判断哪些是新增的，而不是通过切片
-        new_entities = [e for e in final_kg.entities if id(e) not in original_entity_ids]
-        new_relations = [r for r in final_kg.relations if id(r) not in original_relation_ids]
+        # 计算新增的实体和关系（用于持久化）：
+        # 追加语义下直接边界切片，必要时才退回对象ID比对
+        new_entities = _dedup_entities(_new_items(original_entities, final_kg.entities))
+        new_relations = _dedup_relations(_new_items(original_relations, final_kg.relations))
 
         logger.info(f"New entities: {len(new_entities)}, new relations: {len(new_relations)}")
 
@@ -263,18 +624,10 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
             output_tokens=output_tokens,
         )
 
-        from backend.core.config import settings
-
         # 传入 graph_id 实现数据隔离
-        connector = Neo4jConnector(
-            uri=settings.NEO4J_URI,
-            user=settings.NEO4J_USER,
-            password=settings.NEO4J_PASSWORD,
-            graph_id=graph_id,
-        )
-        connector.create_entities(new_entities)
-        connector.create_relations(new_relations)
-        connector.close()
+        _persist_kg_bulk(graph_id, new_entities, new_relations)
+        if graph_id and (new_entities or new_relations):
+            _kg_cache_invalidate(graph_id)
 
         # 更新为完成状态
         update_task_progress(
@@ -290,14 +643,14 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
         )
 
         # 更新文档状态
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if document:
-            document.status = TaskStatus.COMPLETED
-            db.commit()
+        _set_document_status(db, document_id, TaskStatus.COMPLETED)
 
-        # 更新知识图谱统计信息
+        # 更新知识图谱统计信息；没有新增内容时图计数没变，跳过Neo4j计数查询，
+        # 但document_count随本次文档入库增加了，SQLite侧的刷新始终要做
         if graph_id:
-            update_graph_stats(graph_id, db)
+            update_graph_stats(
+                graph_id, db, with_kg_counts=bool(new_entities or new_relations)
+            )
 
         return {
             "status": "completed",
@@ -308,27 +661,40 @@ def process_document(self, document_id: str, file_path: str, task_id: str):
     except SoftTimeLimitExceeded:
         error_msg = "任务超时"
         update_task_progress(task_id, 0, "失败", error_msg, TaskStatus.FAILED)
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if document:
-            document.status = TaskStatus.FAILED
-            db.commit()
-        logger.error(f"Task {task_id} timed out")
+        _set_document_status(db, document_id, TaskStatus.FAILED)
+        logger.error("Task %s timed out", task_id)
         raise
 
     except Exception as e:
         error_msg = f"处理失败: {str(e)}"
         update_task_progress(task_id, 0, "失败", error_msg, TaskStatus.FAILED)
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if document:
-            document.status = TaskStatus.FAILED
-            db.commit()
-        logger.error(f"Task {task_id} failed: {e}", exc_info=True)
+        _set_document_status(db, document_id, TaskStatus.FAILED)
+        logger.error("Task %s failed: %s", task_id, e, exc_info=True)
         raise
 
     finally:
         db.close()
 
 
+@celery_app.task(name="backend.tasks.document_tasks.remove_files")
+def remove_files(file_paths: list[str]):
+    """批量删除磁盘文件
+
+    删除图谱等操作把文件清理移出请求路径后，由该任务异步执行。
+    """
+    removed = 0
+    for file_path in file_paths:
+        try:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+                removed += 1
+        except Exception as e:
+            logger.warning("Failed to delete file %s: %s", file_path, e)
+
+    logger.info(f"Removed {removed}/{len(file_paths)} files")
+    return {"removed": removed, "total": len(file_paths)}
+
+
 @celery_app.task(name="backend.tasks.document_tasks.delete_document")
 def delete_document_from_kg(document_id: str):
     """从知识图谱中删除与文档相关的数据
@@ -353,12 +719,16 @@ def process_single_document(document_id: str, task_id: str):
     """
     db = SessionLocal()
     try:
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if not document:
+        row = db.execute(
+            select(DBDocument.file_path, DBDocument.graph_id).where(
+                DBDocument.id == document_id
+            )
+        ).first()
+        if row is None:
             return {"document_id": document_id, "status": "error", "error": "文档不存在"}
 
-        file_path = document.file_path
-        graph_id = document.graph_id
+        file_path = row.file_path
+        graph_id = row.graph_id
 
         # 更新任务状态
         update_task_progress(task_id, 0.0, "初始化", "准备处理文档...", TaskStatus.PROCESSING)
@@ -366,9 +736,9 @@ def process_single_document(document_id: str, task_id: str):
         # 从Neo4j加载该图谱的已有数据
         kg = load_knowledge_from_neo4j(graph_id)
 
-        # 获取原始实体列表的ID，用于后续比较
-        original_entity_ids = {id(e) for e in kg.entities}
-        original_relation_ids = {id(r) for r in kg.relations}
+        # 快照原始实体/关系引用（浅拷贝指针），用于后续取增量
+        original_entities = kg.entities[:]
+        original_relations = kg.relations[:]
 
         disk = DISK(llm=llm, embeddings=embeddings, kg=kg)
 
@@ -385,9 +755,9 @@ def process_single_document(document_id: str, task_id: str):
             input_tokens = token_summary.get("total_input_tokens", 0)
             output_tokens = token_summary.get("total_output_tokens", 0)
 
-        # 计算新增的实体和关系（通过对象ID判断）
-        new_entities = [e for e in final_kg.entities if id(e) not in original_entity_ids]
-        new_relations = [r for r in final_kg.relations if id(r) not in original_relation_ids]
+        # 计算新增的实体和关系：追加语义下直接边界切片
+        new_entities = _dedup_entities(_new_items(original_entities, final_kg.entities))
+        new_relations = _dedup_relations(_new_items(original_relations, final_kg.relations))
 
         # 持久化到Neo4j（只保存新增的实体和关系）
         update_task_progress(
@@ -399,17 +769,9 @@ def process_single_document(document_id: str, task_id: str):
             output_tokens=output_tokens,
         )
 
-        from backend.core.config import settings
-
-        connector = Neo4jConnector(
-            uri=settings.NEO4J_URI,
-            user=settings.NEO4J_USER,
-            password=settings.NEO4J_PASSWORD,
-            graph_id=graph_id,
-        )
-        connector.create_entities(new_entities)
-        connector.create_relations(new_relations)
-        connector.close()
+        _persist_kg_bulk(graph_id, new_entities, new_relations)
+        if graph_id and (new_entities or new_relations):
+            _kg_cache_invalidate(graph_id)
 
         # 更新为完成状态
         update_task_progress(
@@ -425,10 +787,14 @@ def process_single_document(document_id: str, task_id: str):
         )
 
         # 更新文档状态
-        document = db.query(DBDocument).filter(DBDocument.id == document_id).first()
-        if document:
-            document.status = TaskStatus.COMPLETED
-            db.commit()
+        _set_document_status(db, document_id, TaskStatus.COMPLETED)
+
+        # 更新知识图谱统计信息；没有新增内容时图计数没变，跳过Neo4j计数查询，
+        # 但document_count随本次文档入库增加了，SQLite侧的刷新始终要做
+        if graph_id:
+            update_graph_stats(
+                graph_id, db, with_kg_counts=bool(new_entities or new_relations)
+            )
 
         return {
             "document_id": document_id,
@@ -440,14 +806,33 @@ def process_single_document(document_id: str, task_id: str):
         }
 
     except Exception as e:
-        logger.error(f"Failed to process document {document_id}: {e}", exc_info=True)
+        logger.error("Failed to process document %s: %s", document_id, e, exc_info=True)
         update_task_progress(task_id, 0, "失败", f"处理失败: {str(e)}", TaskStatus.FAILED)
+        _set_document_status(db, document_id, TaskStatus.FAILED)
         return {"document_id": document_id, "status": "error", "error": str(e)}
 
     finally:
         db.close()
 
 
+# 批量路径每个子任务承载的文档数：小PDF居多时，把若干文档摊进
+# 同一个worker任务里，分摊broker消息和prefork调度的固定开销
+BATCH_CHUNK_SIZE = 4
+
+
+@celery_app.task(name="backend.tasks.document_tasks.process_document_chunk")
+def process_document_chunk(doc_task_pairs: list):
+    """串行处理一组 (document_id, task_id) 文档对
+
+    批量构建的子任务单元：组内文档在同一worker进程里依次走
+    process_single_document，组间仍由group并行分发。
+    """
+    return [
+        process_single_document(document_id, task_id)
+        for document_id, task_id in doc_task_pairs
+    ]
+
+
 @celery_app.task(name="backend.tasks.document_tasks.batch_build_documents")
 def batch_build_documents(document_ids: list[str], graph_id: str, batch_task_id: str):
     """批量构建文档知识图谱
@@ -459,8 +844,6 @@ def batch_build_documents(document_ids: list[str], graph_id: str, batch_task_id:
         graph_id: 目标知识图谱ID
         batch_task_id: 批量任务ID
     """
-    from datetime import datetime
-
     db = SessionLocal()
     try:
         # 更新批量任务状态
@@ -476,37 +859,44 @@ def batch_build_documents(document_ids: list[str], graph_id: str, batch_task_id:
         documents = db.query(DBDocument).filter(DBDocument.id.in_(document_ids)).all()
         doc_map = {doc.id: doc for doc in documents}
 
-        # 为每个文档创建任务并启动
+        # 为每个文档创建任务记录；主键整批预生成，随机字节一次取齐。
+        # 主键在客户端已确定，无需refresh回读，全部行攒成一条
+        # executemany INSERT + 单次commit落库
         task_ids = []
+        doc_task_pairs = []
+        task_rows = []
+        batch_ids = uuid7_batch(len(document_ids))
         for i, doc_id in enumerate(document_ids):
             doc = doc_map.get(doc_id)
             if not doc:
-                logger.warning(f"Document not found: {doc_id}")
+                logger.warning("Document not found: %s", doc_id)
                 continue
 
-            # 为每个文档创建任务记录
-            task = DBTask(
-                document_id=doc_id,
-                status=TaskStatus.PENDING,
-                current_step="等待批量处理",
-                message="排队中...",
+            task_rows.append(
+                {
+                    "id": batch_ids[i],
+                    "document_id": doc_id,
+                    "status": TaskStatus.PENDING,
+                    "current_step": "等待批量处理",
+                    "message": "排队中...",
+                }
             )
-            db.add(task)
+            task_ids.append(batch_ids[i])
+            doc_task_pairs.append((doc_id, batch_ids[i]))
+
+        if task_rows:
+            db.bulk_insert_mappings(DBTask, task_rows)
             db.commit()
-            db.refresh(task)
-            task_ids.append(task.id)
-
-            # 异步启动单个文档处理任务（传入文件路径）
-            process_document.delay(doc_id, doc.file_path, task.id)
-
-            # 更新批量任务进度
-            progress = 0.1 + (i + 1) / len(document_ids) * 0.8
-            update_task_progress(
-                batch_task_id,
-                progress,
-                "并行处理",
-                f"已提交 {i + 1}/{len(document_ids)} 个文档任务...",
-            )
+
+        # 任务行全部就位后一次group提交：broker发送走同一条连接
+        # 批量完成，不再每个文档一次.delay()的RPC；文档按
+        # BATCH_CHUNK_SIZE 切块，每块一条消息在worker内串行处理，
+        # 块间照常并行
+        if doc_task_pairs:
+            group(
+                process_document_chunk.s(doc_task_pairs[start : start + BATCH_CHUNK_SIZE])
+                for start in range(0, len(doc_task_pairs), BATCH_CHUNK_SIZE)
+            ).apply_async()
 
         # 注意：由于任务是异步并行执行的，我们这里直接标记批量任务为完成
         # 实际进度可以通过各个文档任务的进度来跟踪
@@ -523,7 +913,7 @@ def batch_build_documents(document_ids: list[str], graph_id: str, batch_task_id:
         return {"status": "submitted", "document_count": len(document_ids), "task_ids": task_ids}
 
     except Exception as e:
-        logger.error(f"Batch build failed: {e}", exc_info=True)
+        logger.error("Batch build failed: %s", e, exc_info=True)
         update_task_progress(batch_task_id, 0, "失败", f"批量处理失败: {str(e)}", TaskStatus.FAILED)
         raise
 